@@ -1,42 +1,82 @@
 import os
-import joblib
+import threading
+import numpy as np
 import pandas as pd
+from serving.artifacts import ArtifactStore
+from serving.features import FIELDS
+from serving.metrics import mark, record_rows
+from serving.prediction_log import log_predictions
 
 BASE_DIR = os.path.dirname(os.path.dirname(__file__))
 ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
 
-# Load artifacts saved during training
-model = joblib.load(os.path.join(ARTIFACTS_DIR, "lightgbm_model.joblib"))
-product_encoder = joblib.load(os.path.join(ARTIFACTS_DIR, "product_id_encoder.joblib"))
-type_encoder = joblib.load(os.path.join(ARTIFACTS_DIR, "type_encoder.joblib"))
+# Artifacts saved during training, shared loader with api_2 (lazy, mmap-backed)
+store = ArtifactStore(ARTIFACTS_DIR)
+
+# Per-thread preallocated input row for the fast path
+_local = threading.local()
+
+def _check_known(X, reqs):
+    # Unseen Product IDs / types are rejected rather than scored as -1
+    for name, rows in store.pipeline.unseen(X).items():
+        label = getattr(reqs[rows[0]], FIELDS[name])
+        raise ValueError(f"Encoding Error: y contains previously unseen labels: '{label}'")
 
-# STANDARDIZED FEATURES: Exactly matches resampling_dataset.py output
-FEATURES = [
-    "Product_ID", "Type", "Air_temperature", "Process_temperature",
-    "Rotational_speed", "Torque", "Tool_wear"
-]
 
 def predict(req):
-    try:
-        # Encode categorical strings using saved encoders
-        product_id = product_encoder.transform([req.product_id])[0]
-        type_ = type_encoder.transform([req.type])[0]
-    except ValueError as e:
-        raise ValueError(f"Encoding Error: {str(e)}")
+    # Encode and build features with the shared pipeline (serving/features.py)
+    pipeline = store.pipeline
+    X = pipeline.transform_records([req])
+    _check_known(X, [req])
 
     # Construct DataFrame with identical column names and order as training
-    df = pd.DataFrame([[
-        product_id,
-        type_,
-        req.air_temperature,
-        req.process_temperature,
-        req.rotational_speed,
-        req.torque,
-        req.tool_wear
-    ]], columns=FEATURES)
-
-    # Perform prediction
-    pred = int(model.predict(df)[0])
-    prob = float(model.predict_proba(df)[0, 1])
-
-    return pred, prob
\ No newline at end of file
+    df = pd.DataFrame(X, columns=pipeline.features)
+    mark("encode")
+    record_rows(1)
+
+    # Perform prediction (one model pass, label from the stored threshold)
+    prob = float(store.model.predict_proba(df)[0, 1])
+    pred = int(prob > store.threshold)
+    mark("predict")
+    log_predictions([req], [(pred, prob)], store.version)
+
+    return pred, prob
+
+
+def _row_buffer(width):
+    # Preallocated contiguous float64 row, one per worker thread
+    row = getattr(_local, "row", None)
+    if row is None or row.shape[1] != width:
+        row = _local.row = np.empty((1, width), dtype=np.float64)
+    return row
+
+
+def predict_fast(req):
+    """Same result as predict(), without pandas or sklearn"""
+    pipeline = store.pipeline
+    row = pipeline.transform_one(req, out=_row_buffer(len(pipeline.features)))
+    _check_known(row, [req])
+    mark("encode")
+    record_rows(1)
+
+    prob = float(store.predict_proba(row)[0])
+    mark("predict")
+    result = int(prob > store.threshold), prob
+    log_predictions([req], [result], store.version)
+    return result
+
+
+def predict_batch_fast(reqs):
+    """Vectorized predict_fast for a list of PredictionRequest objects"""
+    if not reqs:
+        return []
+    X = store.pipeline.transform_records(reqs)
+    _check_known(X, reqs)
+    mark("encode")
+    record_rows(len(X))
+
+    probs = store.predict_proba(X)
+    mark("predict")
+    preds = (probs > store.threshold).astype(int)
+    log_predictions(reqs, (preds, probs), store.version)
+    return list(zip(preds.tolist(), probs.tolist()))
@@ -1,9 +1,40 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware  # <-- Add this
 from api.schemas import PredictionRequest, PredictionResponse
-from api.inference import predict
+from api import inference
+from api.inference import predict_fast
+from serving.executor import InferencePool, Overloaded, overloaded_response
+from serving.metrics import CONTENT_TYPE, MetricsMiddleware, ServingMetrics, mark
+from serving.prediction_log import PredictionLog, PredictionLogMiddleware
+from serving.profiler import SamplingProfiler
 
-app = FastAPI(title="Machine Failure Prediction API")
+# Dedicated, bounded pool for model evaluation (INFERENCE_WORKERS / INFERENCE_MAX_PENDING)
+pool = InferencePool.from_env()
+
+# Latency histograms for GET /metrics and the opt-in slow-request profiler
+profiler = SamplingProfiler.from_env()
+metrics = ServingMetrics("api", lambda: inference.store.version, profiler)
+metrics.gauge("inference_pool_in_flight", "Requests admitted to the inference pool", lambda: [((), pool.in_flight)])
+metrics.gauge("inference_pool_rejected_total", "Requests rejected with 503 Overloaded",
+              lambda: [((), pool.rejected)], kind="counter")
+
+# Audit trail of every scored request, written to rotating JSONL files off the
+# request path (serving/prediction_log.py; PREDICTION_LOG_ENABLED=0 disables it)
+prediction_log = PredictionLog.from_env()
+metrics.gauge("prediction_log_rows_total", "Scored rows written to or dropped from the prediction log",
+              lambda: [(("written",), prediction_log.written_rows), (("dropped",), prediction_log.dropped_rows)],
+              labelnames=("result",), kind="counter")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Write out queued records and compress the last file
+    await asyncio.to_thread(prediction_log.stop)
+
+app = FastAPI(title="Machine Failure Prediction API", lifespan=lifespan)
+app.add_exception_handler(Overloaded, overloaded_response)
 
 # ---------- Add CORS ----------
 origins = [
@@ -20,10 +51,18 @@ app.add_middleware(
 )
 # ---------- End CORS ----------
 
+app.add_middleware(PredictionLogMiddleware, log=prediction_log)
+
+# Outermost, so request latency includes CORS handling
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 @app.post("/predict", response_model=PredictionResponse)
-def predict_failure(req: PredictionRequest):
+async def predict_failure(req: PredictionRequest):
+    mark("validate")
     try:
-        prediction, probability = predict(req)
+        prediction, probability = await pool.run(predict_fast, req)
+    except Overloaded:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -36,5 +75,26 @@ def predict_failure(req: PredictionRequest):
     )
 
 @app.get("/")
-def health():
+async def health():
+    # Answered on the event loop, never queued behind inference
     return {"status": "API running"}
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format: request and per-stage latency histograms, labelled with the model version"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/admin/profiler")
+async def profiler_status():
+    return profiler.stats()
+
+@app.post("/admin/profiler")
+async def configure_profiler(enabled: bool | None = None, slow_ms: float | None = None,
+                             interval_ms: float | None = None):
+    """Turn the sampling profiler (serving/profiler.py) on or off and set its thresholds"""
+    await asyncio.to_thread(profiler.configure, enabled, slow_ms, interval_ms)
+    return profiler.stats()
+
+@app.get("/prediction_log/stats")
+async def prediction_log_stats():
+    return prediction_log.stats()
@@ -0,0 +1,177 @@
+"""Arrow IPC / Parquet batch scoring.
+
+Used by the /batch_predict_arrow endpoint, and as a CLI:
+
+    python api_2/arrow_io.py readings.parquet predictions.parquet
+    python api_2/arrow_io.py readings.arrows predictions.arrows --batch-size 65536
+
+Input columns use the InputSchema names. Output has `prediction` and
+`probability` columns, in the same format as the input.
+"""
+import argparse
+import time
+from functools import lru_cache
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from inference import current_store, predict_matrix
+from serving.features import INPUT_COLUMNS, NUMERIC_INPUTS
+from serving.metrics import mark, record_rows
+from serving.prediction_log import log_predictions
+
+PARQUET = "parquet"
+IPC_STREAM = "arrow-stream"
+IPC_FILE = "arrow-file"
+
+MEDIA_TYPES = {
+    PARQUET: "application/vnd.apache.parquet",
+    IPC_STREAM: "application/vnd.apache.arrow.stream",
+    IPC_FILE: "application/vnd.apache.arrow.file",
+}
+
+
+@lru_cache(maxsize=4)
+def _values(artifacts, name: str) -> pa.Array:
+    # Encoder classes as an Arrow array so strings are encoded inside Arrow compute
+    return pa.array(getattr(artifacts, name), type=pa.string())
+
+
+def detect_format(data) -> str:
+    """Parquet and Arrow IPC files start with magic bytes; anything else is read as an IPC stream"""
+    head = bytes(memoryview(data)[:6])
+    if head[:4] == b"PAR1":
+        return PARQUET
+    if head == b"ARROW1":
+        return IPC_FILE
+    return IPC_STREAM
+
+
+def _encode(column: pa.ChunkedArray, values: pa.Array) -> np.ndarray:
+    if pa.types.is_dictionary(column.type):
+        column = column.cast(column.type.value_type)
+    if not pa.types.is_string(column.type):
+        column = column.cast(pa.string())
+    # Unseen labels (and nulls) map to -1, like the pipeline's encoders
+    return pc.fill_null(pc.index_in(column, value_set=values), -1).to_numpy()
+
+
+def table_to_matrix(table, artifacts) -> np.ndarray:
+    """Arrow Table/RecordBatch with InputSchema column names to the model's float64 feature matrix"""
+    missing = [name for name in INPUT_COLUMNS if name not in table.column_names]
+    if missing:
+        raise ValueError(f"Arrow input is missing columns: {missing}")
+
+    # Strings are encoded inside Arrow; the feature pipeline does the rest
+    encoded = {
+        "Product_ID": _encode(pa.chunked_array(table.column("product_id")), _values(artifacts, "product_classes")),
+        "Type": _encode(pa.chunked_array(table.column("type")), _values(artifacts, "type_classes")),
+    }
+    columns = {}
+    for name in NUMERIC_INPUTS:
+        column = pa.chunked_array(table.column(name))
+        if column.null_count:
+            raise ValueError(f"Column '{name}' contains {column.null_count} null values")
+        # Zero-copy for a single float64 chunk; the pipeline copies it once into X
+        columns[name] = column.to_numpy()
+    return artifacts.pipeline.transform(columns, encoded=encoded)
+
+
+def score_table(table) -> pa.Table:
+    if table.num_rows == 0:
+        preds, probs = np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    else:
+        artifacts = current_store()
+        X = table_to_matrix(table, artifacts)
+        mark("encode")
+        record_rows(len(X))
+        preds, probs = predict_matrix(X, artifacts)
+        mark("predict")
+        log_predictions(table, (preds, probs), artifacts.version)
+    return pa.table({"prediction": pa.array(preds, pa.int64()), "probability": pa.array(probs, pa.float64())})
+
+
+def read_table(data, fmt: str) -> pa.Table:
+    source = pa.BufferReader(data)
+    if fmt == PARQUET:
+        return pq.read_table(source)
+    if fmt == IPC_FILE:
+        return pa.ipc.open_file(source).read_all()
+    return pa.ipc.open_stream(source).read_all()
+
+
+def write_table(table: pa.Table, fmt: str) -> bytes:
+    sink = pa.BufferOutputStream()
+    if fmt == PARQUET:
+        pq.write_table(table, sink)
+    else:
+        new_writer = pa.ipc.new_file if fmt == IPC_FILE else pa.ipc.new_stream
+        with new_writer(sink, table.schema) as writer:
+            writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def score_bytes(data: bytes):
+    """Score an in-memory Arrow IPC / Parquet payload; returns (bytes, format)"""
+    fmt = detect_format(data)
+    try:
+        table = read_table(pa.py_buffer(data), fmt)
+    except pa.ArrowException as e:
+        raise ValueError(f"Could not read {fmt} payload: {e}")
+    mark("decode")
+    result = write_table(score_table(table), fmt)
+    mark("serialize")
+    return result, fmt
+
+
+# -------------------------------------------------
+# CLI: batch-at-a-time, so memory follows --batch-size
+# -------------------------------------------------
+def _iter_batches(path: str, fmt: str, batch_size: int):
+    if fmt == PARQUET:
+        yield from pq.ParquetFile(path).iter_batches(batch_size=batch_size)
+    elif fmt == IPC_FILE:
+        reader = pa.ipc.open_file(pa.memory_map(path))
+        for i in range(reader.num_record_batches):
+            yield reader.get_batch(i)
+    else:
+        yield from pa.ipc.open_stream(pa.memory_map(path))
+
+
+def score_file(input_path: str, output_path: str, batch_size: int = 65536) -> int:
+    with open(input_path, "rb") as f:
+        fmt = detect_format(f.read(6))
+
+    schema = pa.schema([("prediction", pa.int64()), ("probability", pa.float64())])
+    if fmt == PARQUET:
+        writer = pq.ParquetWriter(output_path, schema)
+        write = writer.write_table
+    else:
+        new_writer = pa.ipc.new_file if fmt == IPC_FILE else pa.ipc.new_stream
+        writer = new_writer(output_path, schema)
+        write = writer.write_table
+
+    rows = 0
+    with writer:
+        for batch in _iter_batches(input_path, fmt, batch_size):
+            write(score_table(batch))
+            rows += batch.num_rows
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score an Arrow IPC or Parquet file of sensor readings")
+    parser.add_argument("input", help="Parquet, Arrow IPC file or Arrow IPC stream")
+    parser.add_argument("output", help="Predictions, written in the input's format")
+    parser.add_argument("--batch-size", type=int, default=65536, help="Rows per scored batch")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    rows = score_file(args.input, args.output, args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/sec) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import asyncio
+from contextlib import suppress
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-record predictions into batch calls.
+
+    Requests wait until `max_batch_size` are pending or `max_wait_ms` has
+    passed since the first one arrived, then the whole batch is scored with
+    one `predict_batch(items)` call on `executor` (the default loop executor
+    if None) and every caller gets its own result back.
+    """
+
+    def __init__(self, predict_batch, max_batch_size: int = 64, max_wait_ms: float = 2.0, executor=None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.executor = executor
+
+        self._pending = []
+        self._wakeup = None
+        self._full = None
+        self._task = None
+
+        # Histogram of executed batch sizes, upper bounds 1, 2, 4, ... max_batch_size
+        self.bucket_bounds = []
+        bound = 1
+        while bound < max_batch_size:
+            self.bucket_bounds.append(bound)
+            bound *= 2
+        self.bucket_bounds.append(max_batch_size)
+        self.bucket_counts = [0] * len(self.bucket_bounds)
+        self.batches = 0
+        self.items = 0
+        self.max_queue_depth = 0
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._full = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def submit(self, item):
+        fut = asyncio.get_running_loop().create_future()
+        self._pending.append((item, fut))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+        self._wakeup.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._full.set()
+        return await fut
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "batches": self.batches,
+            "items": self.items,
+            "batch_size_histogram": {
+                f"le_{bound}": count for bound, count in zip(self.bucket_bounds, self.bucket_counts)
+            },
+        }
+
+    def _record(self, size: int):
+        self.batches += 1
+        self.items += size
+        for i, bound in enumerate(self.bucket_bounds):
+            if size <= bound:
+                self.bucket_counts[i] += 1
+                break
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if self.max_wait > 0 and len(self._pending) < self.max_batch_size:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._full.wait(), self.max_wait)
+
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            if len(self._pending) < self.max_batch_size:
+                self._full.clear()
+            if not self._pending:
+                self._wakeup.clear()
+
+            # Callers that disconnected while waiting are skipped
+            batch = [(item, fut) for item, fut in batch if not fut.done()]
+            if not batch:
+                continue
+            self._record(len(batch))
+
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.predict_batch, [item for item, _ in batch]
+                )
+            except Exception as e:
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+
+            for (_, fut), result in zip(batch, results):
+                if not fut.done():
+                    fut.set_result(result)
@@ -0,0 +1,145 @@
+"""Offline bulk scoring of large CSV files.
+
+    python api_2/bulk_score.py Dataset/mfp_testing.csv predictions.csv --workers 8
+    python api_2/bulk_score.py prediction_logs/ replayed.csv
+
+The input uses the Dataset/mfp_testing.csv column layout. The file is split
+into byte ranges on line boundaries, and each range is parsed and scored by
+a worker process that loads the model once. Results are written in input
+order as the input columns plus `prediction` and `probability`.
+
+A prediction log (serving/prediction_log.py: a .jsonl, .jsonl.gz or .parquet
+file, or a directory of them) is replayed instead: the logged rows are
+re-scored with the current model, and the logged results are kept as
+`logged_prediction` and `logged_probability` next to the new ones.
+"""
+import argparse
+import io
+import multiprocessing as mp
+import os
+import sys
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_inference = None
+
+
+def _init_worker():
+    # One model copy per process; keep LightGBM single-threaded so workers don't oversubscribe cores
+    global _inference
+    os.environ["OMP_NUM_THREADS"] = "1"
+    import inference
+    _inference = inference
+
+
+def _score_range(task) -> tuple:
+    import pandas as pd
+
+    path, start, end, header = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    try:
+        df = pd.read_csv(io.BytesIO(data), header=None, names=header, dtype={"product_id": str, "type": str},
+                         float_precision="round_trip")
+    except pd.errors.EmptyDataError:
+        # Only a trailing newline or blank lines fell into this range
+        return 0, b""
+    if len(df):
+        preds, probs = _inference.score_columns(df)
+        df["prediction"] = preds
+        df["probability"] = probs
+    else:
+        df["prediction"] = []
+        df["probability"] = []
+    return len(df), df.to_csv(header=False, index=False).encode()
+
+
+def _rescore_log(df) -> tuple:
+    preds, probs = _inference.score_columns(df)
+    changed = int((df["logged_prediction"].to_numpy() != preds).sum())
+    df = df.assign(prediction=preds, probability=probs)
+    return len(df), changed, df.to_csv(header=False, index=False).encode()
+
+
+def split_ranges(path: str, chunk_bytes: int):
+    """Header columns and (start, end) byte ranges that each end on a line boundary"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.readline().decode("utf-8-sig").strip().split(",")
+        start = f.tell()
+        ranges = []
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return [name.strip() for name in header], ranges
+
+
+def score_csv(input_path: str, output_path: str, workers: int, chunk_bytes: int) -> int:
+    header, ranges = split_ranges(input_path, chunk_bytes)
+    tasks = [(input_path, start, end, header) for start, end in ranges]
+
+    rows = 0
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker) as pool, open(output_path, "wb") as out:
+        out.write((",".join(header + ["prediction", "probability"]) + "\n").encode())
+        # imap yields in task order, so output rows stay in input order
+        for n, data in pool.imap(_score_range, tasks):
+            out.write(data)
+            rows += n
+    return rows
+
+
+def is_log(path: str) -> bool:
+    return os.path.isdir(path) or path.endswith((".jsonl", ".jsonl.gz", ".parquet"))
+
+
+def score_log(input_path: str, output_path: str, workers: int, chunk_rows: int) -> tuple:
+    """Re-score a prediction log; returns (rows, rows whose prediction changed)"""
+    if BASE_DIR not in sys.path:
+        sys.path.append(BASE_DIR)
+    from serving.prediction_log import read_log
+
+    df = read_log(input_path).rename(columns={"prediction": "logged_prediction", "probability": "logged_probability"})
+    chunks = [df.iloc[start:start + chunk_rows] for start in range(0, len(df), chunk_rows)]
+
+    rows = changed = 0
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker) as pool, open(output_path, "wb") as out:
+        out.write((",".join(list(df.columns) + ["prediction", "probability"]) + "\n").encode())
+        for n, n_changed, data in pool.imap(_rescore_log, chunks):
+            out.write(data)
+            rows += n
+            changed += n_changed
+    return rows, changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a large CSV of sensor readings with a process pool")
+    parser.add_argument("input", help="CSV in the Dataset/mfp_testing.csv column layout, or a prediction log to replay")
+    parser.add_argument("output", help="Output CSV: input columns plus prediction and probability")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--chunk-mb", type=float, default=32, help="Approximate CSV megabytes per chunk")
+    parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows per chunk when replaying a prediction log")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if is_log(args.input):
+        rows, changed = score_log(args.input, args.output, args.workers, args.chunk_rows)
+        elapsed = time.perf_counter() - start
+        print(f"Replayed {rows} logged rows with {args.workers} workers in {elapsed:.2f}s "
+              f"({changed} predictions differ from the log) -> {args.output}")
+        return
+    rows = score_csv(args.input, args.output, args.workers, int(args.chunk_mb * 1024 * 1024))
+    elapsed = time.perf_counter() - start
+    print(f"Scored {rows} rows with {args.workers} workers in {elapsed:.2f}s "
+          f"({rows / max(elapsed, 1e-9):,.0f} rows/sec) -> {args.output}")
+
+
+if __name__ == "__main__":
+    main()
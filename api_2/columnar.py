@@ -0,0 +1,78 @@
+import json
+import numpy as np
+import pandas as pd
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+from schemas import ColumnarInputSchema
+from inference import score_columns
+from serving.features import INPUT_COLUMNS, NUMERIC_INPUTS
+from serving.metrics import mark
+
+STRING_INPUTS = [name for name in INPUT_COLUMNS if name not in NUMERIC_INPUTS]
+
+
+def _fast_columns(payload):
+    """Vectorized validation; returns None whenever pydantic has to take a closer look"""
+    if not isinstance(payload, dict) or any(name not in payload for name in INPUT_COLUMNS):
+        return None
+
+    columns = {}
+    for name in STRING_INPUTS:
+        values = payload[name]
+        if not isinstance(values, list) or (values and pd.api.types.infer_dtype(values, skipna=False) != "string"):
+            return None
+        columns[name] = values
+
+    for name in NUMERIC_INPUTS:
+        values = payload[name]
+        if not isinstance(values, list):
+            return None
+        try:
+            arr = np.asarray(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            return None
+        # NaN may come from None, which pydantic rejects
+        if arr.ndim != 1 or np.isnan(arr).any():
+            return None
+        columns[name] = arr
+
+    if len({len(values) for values in columns.values()}) > 1:
+        return None
+    return columns
+
+
+def _validate_columns(payload):
+    """Full ColumnarInputSchema validation, raising the same 422 errors FastAPI would"""
+    try:
+        parsed = ColumnarInputSchema.model_validate(payload)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**err, "loc": ("body", *err["loc"])} for err in e.errors(include_url=False)],
+            body=payload,
+        )
+    return {name: getattr(parsed, name) for name in INPUT_COLUMNS}
+
+
+def score_columnar(body: bytes) -> bytes:
+    """Parse, validate and score a ColumnarInputSchema JSON body into ColumnarOutputSchema JSON"""
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError as e:
+        raise RequestValidationError(
+            [{"type": "json_invalid", "loc": ("body", e.pos), "msg": "JSON decode error",
+              "input": {}, "ctx": {"error": e.msg}}],
+            body=body,
+        )
+
+    columns = _fast_columns(payload)
+    if columns is None:
+        columns = _validate_columns(payload)
+    mark("validate")
+
+    if not len(columns["product_id"]):
+        return json.dumps({"prediction": [], "probability": []}).encode()
+    preds, probs = score_columns(columns)
+    body = json.dumps({"prediction": preds.tolist(), "probability": np.round(probs, 4).tolist()}).encode()
+    mark("serialize")
+    return body
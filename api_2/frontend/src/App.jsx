@@ -15,8 +15,6 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [selectedFile, setSelectedFile] = useState(null);
 
-  const delay = (ms) => new Promise(res => setTimeout(res, ms));
-
   const handleChange = (e) => {
     const { name, value } = e.target;
     setFormData((prev) => ({ ...prev, [name]: value }));
@@ -56,51 +54,40 @@ function App() {
   const handleStreamPredict = async () => {
     if (!selectedFile) return;
     setLoading(true);
-    setBatchResults([]); 
-
-    const reader = new FileReader();
-    reader.onload = async (event) => {
-      try {
-        const text = event.target.result;
-        const lines = text.split(/\r?\n/).filter(line => line.trim() !== "");
-        const rows = lines.slice(1); 
-
-        // One-by-one streaming loop
-        for (let i = 0; i < rows.length; i++) {
-          const rowData = rows[i].split(",").map(item => item.trim());
-          if (rowData.length < 7) continue;
-
-          const singleRowPayload = [{
-            product_id: rowData[0], 
-            type: rowData[1],
-            air_temperature: Number(rowData[2]), 
-            process_temperature: Number(rowData[3]),
-            rotational_speed: Number(rowData[4]), 
-            torque: Number(rowData[5]),
-            tool_wear: Number(rowData[6])
-          }];
-
-          const response = await fetch("http://127.0.0.1:8000/batch_predict", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify(singleRowPayload)
-          });
-
-          if (!response.ok) throw new Error(`Failed at row ${i + 1}`);
-          
-          const newResult = await response.json();
-          setBatchResults(prev => [...prev, ...newResult]);
-          
-          // 1 second delay per row
-          await delay(1000);
-        }
-      } catch (error) {
-        alert("Streaming failed: " + error.message);
-      } finally {
-        setLoading(false);
+    setBatchResults([]);
+
+    try {
+      // Upload the raw CSV; the API scores it in chunks and streams NDJSON back
+      const response = await fetch("http://127.0.0.1:8000/stream_predict", {
+        method: "POST",
+        headers: { "Content-Type": "text/csv" },
+        body: selectedFile
+      });
+
+      if (!response.ok) throw new Error(`Request failed with status ${response.status}`);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+        const newResults = lines.filter(line => line.trim() !== "").map(line => JSON.parse(line));
+
+        const failed = newResults.find(r => r.error);
+        if (failed) throw new Error(failed.error);
+        setBatchResults(prev => [...prev, ...newResults]);
       }
-    };
-    reader.readAsText(selectedFile);
+    } catch (error) {
+      alert("Streaming failed: " + error.message);
+    } finally {
+      setLoading(false);
+    }
   };
 
   return (
@@ -1,59 +1,160 @@
 import os
-import joblib
-import pandas as pd
+import sys
+import time
 import numpy as np
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
 
-# Load model and encoders
-model = joblib.load(os.path.join(ARTIFACTS_DIR, "lightgbm_model.joblib"))
-product_encoder = joblib.load(os.path.join(ARTIFACTS_DIR, "product_id_encoder.joblib"))
-type_encoder = joblib.load(os.path.join(ARTIFACTS_DIR, "type_encoder.joblib"))
-
-FEATURES = [
-    "Product_ID",
-    "Type",
-    "Air_temperature",
-    "Process_temperature",
-    "Rotational_speed",
-    "Torque",
-    "Tool_wear",
-]
-
-def _build_df(records: list[dict]) -> pd.DataFrame:
-    df = pd.DataFrame(records)
-
-    # Rename columns to match model expectations
-    df = df.rename(columns={
-        "product_id": "Product_ID",
-        "type": "Type",
-        "air_temperature": "Air_temperature",
-        "process_temperature": "Process_temperature",
-        "rotational_speed": "Rotational_speed",
-        "torque": "Torque",
-        "tool_wear": "Tool_wear",
-    })
-
-    # SAFE ENCODING: Handles unseen labels by checking classes_
-    df["Product_ID"] = df["Product_ID"].apply(
-        lambda x: product_encoder.transform([x])[0] if x in product_encoder.classes_ else -1
-    )
-    
-    df["Type"] = df["Type"].apply(
-        lambda x: type_encoder.transform([x])[0] if x in type_encoder.classes_ else -1
-    )
-
-    return df[FEATURES]
-
-def make_prediction(data: dict):
-    df = _build_df([data])
-    pred = int(model.predict(df)[0])
-    prob = float(model.predict_proba(df)[0][1])
-    return pred, prob
-
-def make_batch_predictions(data: list[dict]):
-    df = _build_df(data)
-    preds = model.predict(df)
-    probs = model.predict_proba(df)[:, 1]
-    return list(zip(preds.astype(int), probs.astype(float)))
\ No newline at end of file
+# Shared serving helpers live in the project root
+if BASE_DIR not in sys.path:
+    sys.path.append(BASE_DIR)
+from serving.artifacts import ArtifactStore
+from serving.metrics import mark, record_rows
+from serving.prediction_log import log_predictions
+from serving.registry import ModelRegistry
+from prediction_cache import PredictionCache
+
+registry = ModelRegistry()
+
+# Model, encoders and lookup tables, loaded lazily on first use: the registry's
+# current version if one has been published, otherwise artifacts/ itself.
+# INFERENCE_ENGINE selects "lightgbm" (booster) or "flat" (NumPy evaluator, no lightgbm import).
+# Replaced as a whole by set_store(); every scoring call reads it once, so a
+# request that started on one version finishes on it.
+store = registry.store() if registry.current_version() else ArtifactStore(ARTIFACTS_DIR)
+
+# Opt-in result cache for the per-record predictors (PREDICTION_CACHE_SIZE > 0)
+cache = PredictionCache.from_env()
+
+# Per-feature contributions of explained rows, keyed on the near-exact row
+# (EXPLAIN_CACHE_SIZE=0 disables it); explaining costs a few model passes
+explain_cache = PredictionCache.from_env("EXPLAIN_CACHE", max_entries=4096, ttl_seconds=300.0, decimals=6)
+
+def current_store() -> ArtifactStore:
+    return store
+
+def set_store(new_store: ArtifactStore):
+    """Atomically switch every later scoring call to `new_store`"""
+    global store
+    store = new_store
+
+def warm_up(artifacts: ArtifactStore, rows: int = 256) -> float:
+    """Load everything `artifacts` needs and score a synthetic batch, so the first
+    real request after a swap doesn't pay for lazy loading; returns seconds taken"""
+    start = time.perf_counter()
+    artifacts.load_all()
+    rng = np.random.default_rng(0)
+    columns = {
+        "product_id": rng.choice(artifacts.product_classes, rows),
+        "type": rng.choice(artifacts.type_classes, rows),
+        "air_temperature": rng.normal(300, 2, rows),
+        "process_temperature": rng.normal(310, 1.5, rows),
+        "rotational_speed": rng.normal(1540, 180, rows),
+        "torque": rng.normal(40, 10, rows),
+        "tool_wear": rng.integers(0, 250, rows),
+    }
+    X = columns_to_matrix(columns, artifacts)
+    predict_matrix(X, artifacts)
+    predict_matrix(X[:1], artifacts)
+    return time.perf_counter() - start
+
+def predict_matrix(X: np.ndarray, artifacts: ArtifactStore | None = None):
+    """Single model pass over a pipeline-built feature matrix: thresholded labels and probabilities"""
+    artifacts = artifacts or store
+    probs = artifacts.predict_proba(X)
+    preds = (probs > artifacts.threshold).astype(int)
+    return preds, probs
+
+def columns_to_matrix(columns, artifacts: ArtifactStore | None = None) -> np.ndarray:
+    """DataFrame or dict of arrays keyed by request field names (INPUT_COLUMNS keys)
+    to a float64 feature matrix"""
+    artifacts = artifacts or store
+    return artifacts.pipeline.transform(columns)
+
+def score_columns(columns):
+    """columns_to_matrix + predict_matrix against one model version"""
+    artifacts = store
+    X = columns_to_matrix(columns, artifacts)
+    mark("encode")
+    record_rows(len(X))
+    result = predict_matrix(X, artifacts)
+    mark("predict")
+    log_predictions(columns, result, artifacts.version)
+    return result
+
+def make_batch_predictions_fast(items: list):
+    """(prediction, probability) per InputSchema object, through the prediction
+    cache and log; /predict (via the micro-batcher) and /batch_predict use it"""
+    if not items:
+        return []
+    artifacts = store
+    X = artifacts.pipeline.transform_records(items)
+    mark("encode")
+    record_rows(len(X))
+    results = _predict_rows(X, artifacts)
+    mark("predict")
+    log_predictions(items, results, artifacts.version)
+    return results
+
+def _predict_rows(X: np.ndarray, artifacts: ArtifactStore) -> list:
+    """(prediction, probability) per row; with the cache enabled only rows whose
+    quantized key is not cached are scored"""
+    if not cache.enabled:
+        preds, probs = predict_matrix(X, artifacts)
+        return list(zip(preds.tolist(), probs.tolist()))
+
+    keys = cache.keys(X)
+    results = cache.get_many(artifacts.version, keys)
+    missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        preds, probs = predict_matrix(X[missing], artifacts)
+        scored = list(zip(preds.tolist(), probs.tolist()))
+        cache.put_many(artifacts.version, [keys[i] for i in missing], scored)
+        for i, result in zip(missing, scored):
+            results[i] = result
+    return results
+
+def explain_rows(X: np.ndarray, artifacts: ArtifactStore) -> np.ndarray:
+    """TreeSHAP contributions per row, (n, features + 1) with the expected raw
+    score last; with the explanation cache enabled only uncached rows are explained"""
+    if not explain_cache.enabled:
+        return artifacts.explain(X)
+
+    keys = explain_cache.keys(X)
+    cached = explain_cache.get_many(artifacts.version, keys)
+    missing = [i for i, row in enumerate(cached) if row is None]
+    out = np.empty((len(X), X.shape[1] + 1), dtype=np.float64)
+    if missing:
+        contributions = artifacts.explain(X[missing])
+        explain_cache.put_many(artifacts.version, [keys[i] for i in missing], list(contributions))
+        out[missing] = contributions
+    for i, row in enumerate(cached):
+        if row is not None:
+            out[i] = row
+    return out
+
+def explain_batch(items: list) -> list[dict]:
+    """make_batch_predictions_fast plus, per record, each feature's contribution
+    to the raw (log-odds) score; base_value + sum(contributions) = raw score"""
+    if not items:
+        return []
+    artifacts = store
+    X = artifacts.pipeline.transform_records(items)
+    mark("encode")
+    record_rows(len(X))
+    results = _predict_rows(X, artifacts)
+    mark("predict")
+    log_predictions(items, results, artifacts.version)
+    contributions = explain_rows(X, artifacts)
+    mark("explain")
+    names = artifacts.pipeline.features
+    return [
+        {
+            "prediction": pred,
+            "probability": prob,
+            "base_value": float(row[-1]),
+            "contributions": dict(zip(names, row[:-1].tolist())),
+        }
+        for (pred, prob), row in zip(results, contributions)
+    ]
@@ -1,12 +1,157 @@
 import os
-from fastapi import FastAPI
+import sys
+import json
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from typing import List
-from schemas import InputSchema, OutputSchema
-from inference import make_prediction, make_batch_predictions
+from pydantic import ValidationError
+from starlette.requests import ClientDisconnect
+from schemas import (InputSchema, OutputSchema, ExplanationSchema, ColumnarInputSchema, ColumnarOutputSchema,
+                     StreamReadingSchema, StreamOutputSchema)
+import inference
+from inference import cache, explain_batch, explain_cache, make_batch_predictions_fast, registry, warm_up
+from batcher import MicroBatcher
+from machine_state import MachineStateStore
+from columnar import score_columnar
+from arrow_io import MEDIA_TYPES, score_bytes
+from streaming import DuplexStreamingResponse, RequestBody, iter_lines, iter_row_chunks, parse_csv_header, score_rows
 
-app = FastAPI(title="Machine Failure Prediction API")
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Shared serving helpers live in the project root
+if os.path.dirname(current_dir) not in sys.path:
+    sys.path.append(os.path.dirname(current_dir))
+from serving.executor import InferencePool, Overloaded, overloaded_response
+from serving.features import DERIVED
+from serving.metrics import CONTENT_TYPE, MetricsMiddleware, ServingMetrics, mark
+from serving.prediction_log import PredictionLog, PredictionLogMiddleware
+from serving.profiler import SamplingProfiler
+
+# Dedicated, bounded pool for model evaluation (INFERENCE_WORKERS / INFERENCE_MAX_PENDING)
+pool = InferencePool.from_env()
+
+# Request/stage latency histograms for GET /metrics, labelled with the served model version,
+# and the opt-in slow-request profiler (PROFILER_ENABLED, or POST /admin/profiler)
+profiler = SamplingProfiler.from_env()
+metrics = ServingMetrics("api_2", lambda: inference.current_store().version, profiler)
+
+# Audit trail of every scored record, written to rotating JSONL files by a
+# background thread (PREDICTION_LOG_DIR, PREDICTION_LOG_ENABLED=0 disables it)
+prediction_log = PredictionLog.from_env()
+
+def score_micro_batch(items: list):
+    # Micro-batches run outside any request, so their sizes are recorded and their rows logged here
+    metrics.observe_rows("/predict", len(items))
+    with prediction_log.bound("/predict"):
+        return make_batch_predictions_fast(items)
+
+# Micro-batching of concurrent /predict calls: up to BATCH_MAX_SIZE rows or
+# BATCH_MAX_WAIT_MS milliseconds, whichever comes first
+batcher = MicroBatcher(
+    score_micro_batch,
+    max_batch_size=int(os.environ.get("BATCH_MAX_SIZE", 64)),
+    max_wait_ms=float(os.environ.get("BATCH_MAX_WAIT_MS", 2.0)),
+    executor=pool.executor,
+)
+
+metrics.gauge("inference_pool_in_flight", "Requests admitted to the inference pool", lambda: [((), pool.in_flight)])
+metrics.gauge("inference_pool_rejected_total", "Requests rejected with 503 Overloaded",
+              lambda: [((), pool.rejected)], kind="counter")
+metrics.gauge("batcher_queue_depth", "Single-record predictions waiting for a micro-batch",
+              lambda: [((), batcher.queue_depth)])
+
+def cache_lookups():
+    for name, lookups in (("prediction", cache), ("explain", explain_cache)):
+        yield (name, "hit"), lookups.hits
+        yield (name, "miss"), lookups.misses
+
+metrics.gauge("cache_lookups_total", "Prediction and explanation cache lookups", cache_lookups,
+              labelnames=("cache", "result"), kind="counter")
+metrics.gauge("prediction_log_rows_total", "Scored rows written to or dropped from the prediction log",
+              lambda: [(("written",), prediction_log.written_rows), (("dropped",), prediction_log.dropped_rows)],
+              labelnames=("result",), kind="counter")
+metrics.gauge("prediction_log_pending_rows", "Scored rows waiting for the prediction log writer",
+              lambda: [((), prediction_log.pending_rows)])
+
+# Rows parsed and scored per chunk by /stream_predict
+STREAM_CHUNK_ROWS = int(os.environ.get("STREAM_CHUNK_ROWS", 5000))
+
+# Ring buffers of recent readings per product ID for /ws/predict
+# (STREAM_MAX_MACHINES, STREAM_WINDOW, STREAM_IDLE_SECONDS)
+machines = MachineStateStore.from_env()
+temperature_delta = DERIVED["Temperature_delta"][1]
+mechanical_power = DERIVED["Mechanical_power"][1]
+
+metrics.gauge("stream_connections", "Open /ws/predict connections", lambda: [((), machines.connections)])
+metrics.gauge("stream_machines", "Machines with rolling state", lambda: [((), len(machines))])
+metrics.gauge("stream_machines_evicted_total", "Machines whose rolling state was evicted",
+              lambda: [(("lru",), machines.evicted), (("idle",), machines.idle_evicted)],
+              labelnames=("reason",), kind="counter")
+
+# Poll the registry manifest every MODEL_WATCH_SECONDS and hot-reload when the
+# current version changes (0 = only reload through POST /admin/reload)
+MODEL_WATCH_SECONDS = float(os.environ.get("MODEL_WATCH_SECONDS", 0))
+
+logger = logging.getLogger(__name__)
+
+# -------------------------------------------------
+# Model hot-reload
+# -------------------------------------------------
+reload_lock = asyncio.Lock()
+reload_tasks = set()
+reload_state = {"status": "idle", "target": None, "error": None, "warm_up_ms": None}
+
+async def reload_model(version: str | None = None):
+    """Load `version` (default: the registry's current one) off the event loop,
+    warm it up, then swap it in; requests already scoring keep the old version"""
+    async with reload_lock:
+        version = version or registry.current_version()
+        if version is None or version == inference.current_store().version:
+            return
+        reload_state.update(status="loading", target=version, error=None)
+        try:
+            new_store = registry.store(version)
+            # Default executor, so loading never takes an inference pool slot
+            elapsed = await asyncio.to_thread(warm_up, new_store)
+        except Exception as e:
+            logger.exception("Reload of model version %s failed", version)
+            reload_state.update(status="failed", error=str(e))
+            return
+        inference.set_store(new_store)
+        reload_state.update(status="idle", warm_up_ms=round(elapsed * 1000, 2))
+        logger.info("Now serving model version %s", version)
+
+async def watch_registry():
+    while True:
+        await asyncio.sleep(MODEL_WATCH_SECONDS)
+        try:
+            current = await asyncio.to_thread(registry.current_version)
+        except (OSError, ValueError):
+            # Manifest mid-write or unreadable; try again next tick
+            continue
+        if current and current != inference.current_store().version:
+            await reload_model(current)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await batcher.start()
+    watcher = asyncio.create_task(watch_registry()) if MODEL_WATCH_SECONDS > 0 else None
+    yield
+    if watcher:
+        watcher.cancel()
+    await batcher.stop()
+    pool.shutdown()
+    profiler.stop()
+    # Writes out queued records and compresses the last file
+    await asyncio.to_thread(prediction_log.stop)
+
+app = FastAPI(title="Machine Failure Prediction API", lifespan=lifespan)
+app.add_exception_handler(Overloaded, overloaded_response)
 
 # FIX: Add CORS Middleware to allow your React app (port 5173) to connect
 app.add_middleware(
@@ -17,28 +162,131 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(PredictionLogMiddleware, log=prediction_log)
+
+# Outermost, so request latency includes CORS handling
+app.add_middleware(MetricsMiddleware, metrics=metrics)
+
 # Serves the feature importance image from your local api_2 directory
-current_dir = os.path.dirname(os.path.abspath(__file__))
 app.mount("/static", StaticFiles(directory=current_dir), name="static")
 
 @app.get("/")
-def health():
+async def health():
+    # Answered on the event loop, never queued behind inference
     return {"status": "API running"}
 
-@app.post("/predict", response_model=OutputSchema)
-def predict_single(input_data: InputSchema):
-    """Predict failure for a single record"""
-    pred, prob = make_prediction(input_data.model_dump())
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text format: request and per-stage latency histograms, rows per
+    model call, pool/batcher/cache gauges, all labelled with the model version"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
+@app.get("/admin/profiler")
+async def profiler_status():
+    """Sampling profiler settings and the flame-graph files written so far"""
+    return profiler.stats()
+
+@app.post("/admin/profiler")
+async def configure_profiler(enabled: bool | None = None, slow_ms: float | None = None,
+                             interval_ms: float | None = None):
+    """Turn the sampling profiler on or off and set its thresholds; requests slower
+    than slow_ms get their samples written as collapsed stacks (serving/profiler.py)"""
+    # Stopping joins the sampler thread
+    await asyncio.to_thread(profiler.configure, enabled, slow_ms, interval_ms)
+    return profiler.stats()
+
+@app.get("/batcher/stats")
+async def batcher_stats():
+    """Micro-batcher queue depth, batch-size histogram and inference pool load"""
+    return {**batcher.stats(), "pool": pool.stats()}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Prediction cache size, hit/miss counters and evictions (PREDICTION_CACHE_SIZE=0 disables it),
+    and the same for the explanation cache under "explain" """
+    return {**cache.stats(), "explain": explain_cache.stats()}
+
+@app.get("/prediction_log/stats")
+async def prediction_log_stats():
+    """Prediction log writer: current file, queued/written/dropped row counters and rotations"""
+    return prediction_log.stats()
+
+@app.get("/machines/stats")
+async def machine_stats():
+    """Per-machine streaming state: tracked machines, evictions, open connections and memory"""
+    return machines.stats()
+
+@app.get("/artifacts")
+async def artifacts():
+    """Scoring engine and per-artifact load times (artifacts load lazily on first use)"""
+    store = inference.current_store()
+    return {
+        "version": store.version,
+        "engine": store.engine,
+        "load_times_ms": {name: round(t * 1000, 2) for name, t in store.load_times.items()},
+    }
+
+@app.get("/admin/model")
+async def model_version():
+    """Served model version, the registry's current version and reload progress"""
+    return {
+        "serving": inference.current_store().version,
+        "registry_current": await asyncio.to_thread(registry.current_version),
+        "reload": reload_state,
+    }
+
+@app.post("/admin/reload", status_code=202)
+async def reload(version: str | None = None):
+    """Hot-reload a registry version (default: current) in the background"""
+    target = version or await asyncio.to_thread(registry.current_version)
+    if target is None:
+        raise HTTPException(status_code=404, detail="No model versions published in the registry")
+    if not registry.valid_name(target):
+        raise HTTPException(status_code=400, detail=f"Invalid model version {target!r}")
+    # Only versions listed in the manifest, never an arbitrary directory
+    if not await asyncio.to_thread(registry.published, target):
+        raise HTTPException(status_code=404, detail=f"Unknown model version {target!r}")
+    task = asyncio.create_task(reload_model(target))
+    # Keep a reference until it finishes, or the task may be garbage collected
+    reload_tasks.add(task)
+    task.add_done_callback(reload_tasks.discard)
+    return {"serving": inference.current_store().version, "target": target}
+
+def explanation(result: dict) -> ExplanationSchema:
+    return ExplanationSchema(
+        prediction=result["prediction"],
+        probability=round(result["probability"], 4),
+        message="Failure predicted" if result["prediction"] == 1 else "No failure predicted",
+        base_value=result["base_value"],
+        contributions=result["contributions"],
+    )
+
+@app.post("/predict", response_model=ExplanationSchema | OutputSchema)
+async def predict_single(input_data: InputSchema, explain: bool = False):
+    """Predict failure for a single record; with ?explain=true also return each
+    feature's TreeSHAP contribution to the raw score"""
+    mark("validate")
+    if explain:
+        # Explanations skip the micro-batcher, which only returns (prediction, probability)
+        results = await pool.run(explain_batch, [input_data])
+        return explanation(results[0])
+    with pool.admit():
+        pred, prob = await batcher.submit(input_data)
+    # Waiting for the micro-batch plus the batched model call
+    mark("batch")
     return OutputSchema(
         prediction=pred,
         probability=round(prob, 4),
         message="Failure predicted" if pred == 1 else "No failure predicted"
     )
 
-@app.post("/batch_predict", response_model=List[OutputSchema])
-def predict_batch(inputs: List[InputSchema]):
-    """Predict failure for a list of records"""
-    results = make_batch_predictions([x.model_dump() for x in inputs])
+@app.post("/batch_predict", response_model=List[ExplanationSchema] | List[OutputSchema])
+async def predict_batch(inputs: List[InputSchema], explain: bool = False):
+    """Predict failure for a list of records (?explain=true adds contributions, as for /predict)"""
+    mark("validate")
+    if explain:
+        return [explanation(result) for result in await pool.run(explain_batch, inputs)]
+    results = await pool.run(make_batch_predictions_fast, inputs)
     return [
         OutputSchema(
             prediction=pred,
@@ -46,4 +294,101 @@ def predict_batch(inputs: List[InputSchema]):
             message="Failure predicted" if pred == 1 else "No failure predicted"
         )
         for pred, prob in results
-    ]
\ No newline at end of file
+    ]
+
+@app.post(
+    "/batch_predict_columnar",
+    response_model=ColumnarOutputSchema,
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": ColumnarInputSchema.model_json_schema()}},
+    }},
+)
+async def predict_batch_columnar(request: Request):
+    """Predict failure for a batch sent as one array per field (ColumnarInputSchema).
+    Validated in bulk with NumPy instead of one pydantic model per row."""
+    body = await request.body()
+    mark("receive")
+    return Response(await pool.run(score_columnar, body), media_type="application/json")
+
+@app.post("/batch_predict_arrow")
+async def predict_batch_arrow(request: Request):
+    """Predict failure for an Arrow IPC stream/file or Parquet body with InputSchema
+    columns; predictions come back in the same format"""
+    body = await request.body()
+    mark("receive")
+    try:
+        result, fmt = await pool.run(score_bytes, body)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(result, media_type=MEDIA_TYPES[fmt])
+
+@app.post("/stream_predict")
+async def predict_stream(request: Request):
+    """Score a raw CSV (Dataset/mfp_testing.csv layout) or NDJSON upload in
+    fixed-size chunks as it arrives, streaming NDJSON results back in order"""
+    pool.check()
+    body = RequestBody(request)
+    lines = iter_lines(body)
+
+    header = None
+    if "json" not in request.headers.get("content-type", ""):
+        try:
+            header = parse_csv_header(await anext(lines, b""))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    async def results():
+        try:
+            with pool.admit():
+                async for rows in iter_row_chunks(lines, STREAM_CHUNK_ROWS):
+                    yield await pool.execute(score_rows, rows, header)
+        except ClientDisconnect:
+            # Upload cut short: nobody is left to read the results
+            return
+        except Exception as e:
+            # Headers are already sent, so errors are reported in-band and end the stream
+            yield (json.dumps({"error": str(e)}) + "\n").encode()
+
+    return DuplexStreamingResponse(results(), body=body, media_type="application/x-ndjson")
+
+@app.websocket("/ws/predict")
+async def predict_websocket(websocket: WebSocket):
+    """Stateful per-machine scoring: each text message is one StreamReadingSchema
+    reading, answered in order with a StreamOutputSchema message (or {"error": ...})
+    carrying the prediction and the machine's rolling wear, temperature and power trends"""
+    await websocket.accept()
+    machines.connections += 1
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                reading = StreamReadingSchema.model_validate_json(message)
+            except ValidationError as e:
+                await websocket.send_text('{"error":' + e.json(include_url=False) + "}")
+                continue
+            # O(1) update on the event loop; scoring goes through the micro-batcher like /predict
+            features = machines.update(
+                reading.product_id,
+                reading.timestamp if reading.timestamp is not None else time.time(),
+                reading.tool_wear,
+                temperature_delta(reading.air_temperature, reading.process_temperature),
+                mechanical_power(reading.torque, reading.rotational_speed),
+            )
+            try:
+                with pool.admit():
+                    pred, prob = await batcher.submit(reading)
+            except Overloaded as e:
+                await websocket.send_text(json.dumps({"error": str(e), "retry_after": e.retry_after}))
+                continue
+            await websocket.send_text(StreamOutputSchema(
+                prediction=pred,
+                probability=round(prob, 4),
+                message="Failure predicted" if pred == 1 else "No failure predicted",
+                product_id=reading.product_id,
+                **features,
+            ).model_dump_json())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        machines.connections -= 1
@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class PredictionCache:
+    """Bounded LRU + TTL cache of (prediction, probability) per quantized input row.
+
+    Keys are feature matrix rows (encoded product and type, sensors rounded
+    to `decimals`), so repeated or near-identical readings skip the model.
+    Entries live at most `ttl_seconds` and the least recently used one is
+    evicted beyond `max_entries`. Everything is dropped when the model
+    version changes. `max_entries=0` disables the cache.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float, decimals: int):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.decimals = decimals
+        self.version = None
+        self._entries = OrderedDict()
+        # Scoring runs on several inference pool threads
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_env(cls, prefix: str = "PREDICTION_CACHE", max_entries: int = 0,
+                 ttl_seconds: float = 5.0, decimals: int = 1) -> "PredictionCache":
+        """Settings from <prefix>_SIZE, <prefix>_TTL and <prefix>_DECIMALS, else the given defaults"""
+        return cls(
+            max_entries=int(os.environ.get(f"{prefix}_SIZE", max_entries)),
+            ttl_seconds=float(os.environ.get(f"{prefix}_TTL", ttl_seconds)),
+            decimals=int(os.environ.get(f"{prefix}_DECIMALS", decimals)),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def keys(self, X) -> list:
+        """One hashable key per row of a feature matrix"""
+        return list(map(tuple, X.round(self.decimals).tolist()))
+
+    def _bind(self, version: str):
+        # Caller holds the lock
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.version = version
+
+    def get_many(self, version: str, keys: list) -> list:
+        """Cached value (e.g. (prediction, probability)) per key, or None for a miss"""
+        now = time.monotonic()
+        results = []
+        with self._lock:
+            self._bind(version)
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    results.append(None)
+                elif entry[0] < now:
+                    del self._entries[key]
+                    self.expired += 1
+                    self.misses += 1
+                    results.append(None)
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    results.append(entry[1])
+        return results
+
+    def put_many(self, version: str, keys: list, values: list):
+        expires = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            self._bind(version)
+            for key, value in zip(keys, values):
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "version": self.version,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "decimals": self.decimals,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
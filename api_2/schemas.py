@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from typing import Dict, List, Optional
+from pydantic import BaseModel, model_validator
 
 class InputSchema(BaseModel):
     product_id: str
@@ -14,3 +15,50 @@ class OutputSchema(BaseModel):
     prediction: int
     probability: float
     message: str
+
+
+class ExplanationSchema(OutputSchema):
+    """OutputSchema plus TreeSHAP feature contributions to the raw (log-odds)
+    score: base_value + sum(contributions.values()) is the model's raw score"""
+    base_value: float
+    contributions: Dict[str, float]
+
+
+class StreamReadingSchema(InputSchema):
+    """One reading sent over /ws/predict; `timestamp` (epoch seconds) defaults to its arrival time"""
+    timestamp: Optional[float] = None
+
+
+class StreamOutputSchema(OutputSchema):
+    """Prediction for one streamed reading plus its machine's rolling features
+    over the last STREAM_WINDOW readings (slopes are per minute, None until
+    two readings at different times have arrived)"""
+    product_id: str
+    readings: int
+    tool_wear_rate: Optional[float]
+    temperature_delta_trend: Optional[float]
+    power_kw: float
+    mean_power_kw: float
+
+
+class ColumnarInputSchema(BaseModel):
+    """Batch of records as one array per InputSchema field"""
+    product_id: List[str]
+    type: List[str]
+    air_temperature: List[float]
+    process_temperature: List[float]
+    rotational_speed: List[float]
+    torque: List[float]
+    tool_wear: List[float]
+
+    @model_validator(mode="after")
+    def check_lengths(self):
+        lengths = {name: len(values) for name, values in self}
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"All columns must have the same length, got {lengths}")
+        return self
+
+
+class ColumnarOutputSchema(BaseModel):
+    prediction: List[int]
+    probability: List[float]
@@ -0,0 +1,137 @@
+import io
+import json
+import anyio
+import pandas as pd
+from fastapi.responses import StreamingResponse
+from starlette.requests import ClientDisconnect, Request
+
+from inference import score_columns
+from serving.features import INPUT_COLUMNS
+
+# Column layout of Dataset/mfp_testing.csv (same names as InputSchema)
+CSV_COLUMNS = list(INPUT_COLUMNS)
+
+_MESSAGES = ("No failure predicted", "Failure predicted")
+
+
+class RequestBody:
+    """Request body chunks that record when the upload is complete.
+
+    Reads `receive` directly instead of request.stream(), so `done` is set as
+    soon as the last body message arrives rather than once the consumer has
+    worked through everything before it.
+    """
+
+    def __init__(self, request: Request):
+        self._receive = request.receive
+        self.done = anyio.Event()
+
+    async def __aiter__(self):
+        while not self.done.is_set():
+            message = await self._receive()
+            if message["type"] == "http.disconnect":
+                self.done.set()
+                raise ClientDisconnect()
+            if not message.get("more_body", False):
+                self.done.set()
+            if message.get("body"):
+                yield message["body"]
+
+
+class DuplexStreamingResponse(StreamingResponse):
+    """StreamingResponse that can run while the request body is still arriving.
+
+    Starlette's version listens for disconnects on `receive` from the start,
+    which would swallow the rest of an upload that is still being read. Here
+    `receive` belongs to the RequestBody until it is exhausted (a disconnect
+    meanwhile raises ClientDisconnect from it); only then does the response
+    listen for http.disconnect and cancel the producer, so a client that goes
+    away mid-stream stops the scoring.
+    """
+
+    def __init__(self, content, body: RequestBody, **kwargs):
+        super().__init__(content, **kwargs)
+        self.body = body
+
+    async def __call__(self, scope, receive, send):
+        disconnected = False
+        async with anyio.create_task_group() as task_group:
+
+            async def watch_disconnect():
+                await self.body.done.wait()
+                await self.listen_for_disconnect(receive)
+                task_group.cancel_scope.cancel()
+
+            task_group.start_soon(watch_disconnect)
+            try:
+                await self.stream_response(send)
+            except OSError:
+                disconnected = True
+            task_group.cancel_scope.cancel()
+
+        if disconnected:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+async def iter_lines(byte_stream):
+    """Split an async stream of byte chunks into lines as they arrive"""
+    remainder = b""
+    async for chunk in byte_stream:
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+        for line in lines:
+            yield line
+    if remainder:
+        yield remainder
+
+
+async def iter_row_chunks(lines, chunk_rows: int):
+    """Group non-blank lines into lists of at most `chunk_rows`"""
+    rows = []
+    async for line in lines:
+        if not line.strip():
+            continue
+        rows.append(line)
+        if len(rows) >= chunk_rows:
+            yield rows
+            rows = []
+    if rows:
+        yield rows
+
+
+def parse_csv_header(line: bytes) -> list:
+    header = line.decode("utf-8-sig").strip().split(",")
+    header = [name.strip() for name in header]
+    missing = [col for col in CSV_COLUMNS if col not in header]
+    if missing:
+        raise ValueError(f"CSV header is missing columns: {missing}")
+    return header
+
+
+def parse_csv_rows(rows: list, header: list) -> pd.DataFrame:
+    return pd.read_csv(
+        io.BytesIO(b"\n".join(rows)),
+        header=None,
+        names=header,
+        dtype={"product_id": str, "type": str},
+    )
+
+
+def parse_ndjson_rows(rows: list) -> pd.DataFrame:
+    df = pd.DataFrame.from_records([json.loads(row) for row in rows])
+    missing = [col for col in CSV_COLUMNS if col not in df.columns]
+    if missing:
+        raise ValueError(f"NDJSON records are missing fields: {missing}")
+    return df
+
+
+def score_rows(rows: list, header: list | None) -> bytes:
+    """Parse and score one chunk of raw lines, returning NDJSON result lines"""
+    df = parse_ndjson_rows(rows) if header is None else parse_csv_rows(rows, header)
+    preds, probs = score_columns(df)
+    return "".join(
+        f'{{"prediction":{pred},"probability":{round(prob, 4)},"message":"{_MESSAGES[pred]}"}}\n'
+        for pred, prob in zip(preds.tolist(), probs.tolist())
+    ).encode()
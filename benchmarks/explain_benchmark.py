@@ -0,0 +1,56 @@
+# explain_benchmark.py
+# Cost of explaining predictions in api_2: plain scoring vs. vectorized
+# TreeSHAP (serving/tree_shap.py, cold and with a warm explanation cache) vs.
+# LightGBM's per-row Booster.predict(pred_contrib=True), at several batch sizes.
+#
+#     python benchmarks/explain_benchmark.py
+#     INFERENCE_ENGINE=flat python benchmarks/explain_benchmark.py
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "api_2"))
+
+from inference import explain_cache, explain_rows, predict_matrix, store
+
+BATCH_SIZES = [int(n) for n in os.environ.get("BENCH_BATCH_SIZES", "1,100,1000,10000").split(",")]
+# pred_contrib takes ~2 ms per row, so it is timed on a prefix of large batches
+CONTRIB_ROWS = int(os.environ.get("BENCH_CONTRIB_ROWS", 1000))
+# Room for the largest batch, or the cached pass would just evict itself
+explain_cache.max_entries = max(explain_cache.max_entries, max(BATCH_SIZES))
+
+df = pd.read_csv(os.path.join(BASE_DIR, "Dataset", "ai4i2020.csv"))
+X_all = store.pipeline.transform(df)
+
+start = time.perf_counter()
+store.explain
+print(f"Engine: {store.engine}, TreeSHAP tables built in {(time.perf_counter() - start) * 1000:.0f} ms\n")
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    out = fn(*args, **kwargs)
+    return time.perf_counter() - start, out
+
+
+print(f"{'rows':>7}{'score ms':>10}{'explain ms':>12}{'x score':>9}{'cached ms':>11}"
+      f"{'pred_contrib ms':>17}{'max |diff|':>12}")
+for n in BATCH_SIZES:
+    X = X_all[np.arange(n) % len(X_all)]
+    score_s, _ = timed(predict_matrix, X, store)
+    explain_s, contributions = timed(store.explain, X)
+
+    # Second pass over the same rows is served from the explanation cache
+    explain_cache.clear()
+    explain_rows(X, store)
+    cached_s, _ = timed(explain_rows, X, store)
+
+    m = min(n, CONTRIB_ROWS)
+    contrib_s, reference = timed(store.booster.predict, X[:m], pred_contrib=True)
+    max_diff = np.abs(contributions[:m] - reference).max()
+    print(f"{n:>7}{score_s * 1000:>10.1f}{explain_s * 1000:>12.1f}{explain_s / score_s:>9.1f}"
+          f"{cached_s * 1000:>11.1f}{contrib_s * n / m * 1000:>17.1f}{max_diff:>12.1e}")
+print(f"\npred_contrib for batches above {CONTRIB_ROWS} rows is extrapolated from the first {CONTRIB_ROWS}")
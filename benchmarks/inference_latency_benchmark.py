@@ -0,0 +1,76 @@
+# inference_latency_benchmark.py
+# p50/p99 latency of the DataFrame + sklearn path vs. the NumPy booster fast path,
+# for single records (api/inference) and batches (api_2/inference).
+import os
+import sys
+import json
+import time
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+sys.path.insert(0, os.path.join(BASE_DIR, "api_2"))
+
+from api.schemas import PredictionRequest
+from api.inference import predict, predict_fast
+from schemas import InputSchema
+from inference import _predict_rows, current_store, make_batch_predictions_fast
+
+N_SINGLE = int(os.environ.get("BENCH_SINGLE_CALLS", 2_000))
+N_BATCH = int(os.environ.get("BENCH_BATCH_CALLS", 50))
+BATCH_SIZE = int(os.environ.get("BENCH_BATCH_SIZE", 1_000))
+
+with open(os.path.join(BASE_DIR, "values_testing.txt")) as f:
+    payloads = json.load(f)
+
+
+def percentiles(fn, arg, calls):
+    fn(arg)  # warm-up
+    timings = np.empty(calls)
+    for i in range(calls):
+        start = time.perf_counter()
+        fn(arg)
+        timings[i] = time.perf_counter() - start
+    return np.percentile(timings, [50, 99]) * 1e6
+
+
+def batch_via_dataframe(items):
+    """Old batch encoding (records -> DataFrame -> pipeline), scored through the
+    same _predict_rows as the fast path"""
+    artifacts = current_store()
+    X = artifacts.pipeline.transform(pd.DataFrame([x.model_dump() for x in items]))
+    return _predict_rows(X, artifacts)
+
+
+def report(label, old, new):
+    print(f"{label}")
+    print(f"  old  p50 {old[0]:>10,.1f} us   p99 {old[1]:>10,.1f} us")
+    print(f"  new  p50 {new[0]:>10,.1f} us   p99 {new[1]:>10,.1f} us")
+    print(f"  p50 speedup: {old[0] / new[0]:.1f}x")
+
+
+# -------------------------------------------------
+# Single record (api)
+# -------------------------------------------------
+req = PredictionRequest(**payloads[0])
+assert predict(req) == predict_fast(req)
+report(
+    f"Single record, {N_SINGLE} calls",
+    percentiles(predict, req, N_SINGLE),
+    percentiles(predict_fast, req, N_SINGLE),
+)
+
+# -------------------------------------------------
+# Batch (api_2)
+# -------------------------------------------------
+items = [InputSchema(**payloads[i % len(payloads)]) for i in range(BATCH_SIZE)]
+old_out = batch_via_dataframe(items)
+new_out = make_batch_predictions_fast(items)
+assert [int(p) for p, _ in old_out] == [p for p, _ in new_out]
+assert np.allclose([p for _, p in old_out], [p for _, p in new_out], rtol=0, atol=1e-12)
+report(
+    f"Batch of {BATCH_SIZE}, {N_BATCH} calls",
+    percentiles(batch_via_dataframe, items, N_BATCH),
+    percentiles(make_batch_predictions_fast, items, N_BATCH),
+)
@@ -0,0 +1,379 @@
+# load_test.py
+# End-to-end HTTP load test of both APIs: starts api.main:app and api_2.main:app
+# with uvicorn, drives them from an asyncio keep-alive client at several
+# concurrency levels and batch sizes, and reports throughput, p50/p95/p99
+# latency of the successful requests and server RSS. Results are saved as JSON (with the git commit) so
+# runs on different commits can be compared:
+#
+#     python benchmarks/load_test.py                          # both apps, defaults
+#     python benchmarks/load_test.py --apps api_2 --concurrency 1,32 --batch-sizes 10,1000
+#     python benchmarks/load_test.py --compare benchmarks/results/<baseline>.json
+#     python benchmarks/load_test.py --compare old.json --current new.json   # no run
+#
+# Traffic is the sample payloads (values_testing.txt and
+# Dataset/mfp_testing.csv, replayed in order; most mfp_testing product IDs are
+# unknown to the model, which api/ rejects with 400), synthetic AI4I-shaped
+# records (known product IDs with sensor readings drawn around the dataset's
+# means), or recorded production traffic from a prediction log
+# (--traffic log --log-path prediction_logs/). Server settings
+# (INFERENCE_ENGINE, INFERENCE_WORKERS, BATCH_MAX_SIZE, PREDICTION_CACHE_SIZE,
+# PREDICTION_LOG_ENABLED, ...) are passed through from the environment.
+#
+# Client and server share the machine, so absolute numbers include the
+# client's own CPU use; compare runs made on the same host.
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import platform
+import subprocess
+import numpy as np
+import pandas as pd
+import psutil
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BASE_DIR, "benchmarks", "results")
+
+# uvicorn target and working directory per app (api_2 uses flat imports)
+APPS = {
+    "api": ("api.main:app", BASE_DIR),
+    "api_2": ("main:app", os.path.join(BASE_DIR, "api_2")),
+}
+# Server settings recorded with the results
+SERVER_ENV = ["INFERENCE_ENGINE", "INFERENCE_WORKERS", "INFERENCE_MAX_PENDING", "BATCH_MAX_SIZE",
+              "BATCH_MAX_WAIT_MS", "PREDICTION_CACHE_SIZE", "EXPLAIN_CACHE_SIZE", "PREDICTION_LOG_ENABLED",
+              "PREDICTION_LOG_ON_FULL", "PREDICTION_LOG_MAX_PENDING"]
+FIELDS = ["product_id", "type", "air_temperature", "process_temperature", "rotational_speed", "torque", "tool_wear"]
+
+
+# -------------------------------------------------
+# Traffic
+# -------------------------------------------------
+def sample_records() -> list[dict]:
+    with open(os.path.join(BASE_DIR, "values_testing.txt")) as f:
+        records = json.load(f)
+    testing = pd.read_csv(os.path.join(BASE_DIR, "Dataset", "mfp_testing.csv"))
+    return records + testing[FIELDS].to_dict(orient="records")
+
+
+def synthetic_records(n: int, seed: int = 0) -> list[dict]:
+    """AI4I 2020-shaped records with product IDs the model knows"""
+    df = pd.read_csv(os.path.join(BASE_DIR, "Dataset", "ai4i2020.csv"))
+    rng = np.random.default_rng(seed)
+    ids = rng.choice(df["Product ID"].to_numpy(), n)
+    air = rng.normal(300.0, 2.0, n)
+    return pd.DataFrame({
+        "product_id": ids,
+        # The type is the product ID's first letter (L, M, H)
+        "type": [product_id[0] for product_id in ids],
+        "air_temperature": air.round(1),
+        "process_temperature": (air + 10 + rng.normal(0, 1.0, n)).round(1),
+        "rotational_speed": rng.normal(1539, 179, n).round().clip(1168, 2886),
+        "torque": rng.normal(40.0, 10.0, n).round(1).clip(3.8, 76.6),
+        "tool_wear": rng.integers(0, 254, n),
+    }).to_dict(orient="records")
+
+
+def log_records(path: str) -> list[dict]:
+    """Requests recorded in a prediction log (serving/prediction_log.py), in logged order"""
+    if BASE_DIR not in sys.path:
+        sys.path.append(BASE_DIR)
+    from serving.prediction_log import read_log
+    records = read_log(path)[FIELDS].to_dict(orient="records")
+    if not records:
+        raise SystemExit(f"No logged predictions found in {path}")
+    return records
+
+
+def request_bodies(records: list[dict], endpoint: str, batch_size: int, count: int = 64) -> list[bytes]:
+    """Pre-encoded JSON bodies, so the client does no serialization while timing"""
+    bodies = []
+    for i in range(count):
+        rows = [records[(i * batch_size + j) % len(records)] for j in range(batch_size)]
+        if endpoint == "/predict":
+            payload = rows[0]
+        elif endpoint == "/batch_predict_columnar":
+            payload = {name: [row[name] for row in rows] for name in FIELDS}
+        else:
+            payload = rows
+        bodies.append(json.dumps(payload, default=lambda v: v.item()).encode())
+    return bodies
+
+
+# -------------------------------------------------
+# Minimal HTTP/1.1 keep-alive client
+# -------------------------------------------------
+class Connection:
+    def __init__(self, host: str, port: int):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    async def post(self, path: str, body: bytes) -> int:
+        self.writer.write(
+            f"POST {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n".encode() + body
+        )
+        await self.writer.drain()
+        status = int((await self.reader.readline()).split()[1])
+        length = 0
+        while (line := await self.reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        await self.reader.readexactly(length)
+        return status
+
+
+# -------------------------------------------------
+# Server process
+# -------------------------------------------------
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(app: str, port: int, timeout: float = 120.0) -> subprocess.Popen:
+    target, cwd = APPS[app]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd,
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"{app} exited with code {server.returncode} during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"{app} did not start listening on port {port} within {timeout:.0f}s")
+
+
+def stop_server(server: subprocess.Popen):
+    server.terminate()
+    try:
+        server.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        server.kill()
+
+
+# -------------------------------------------------
+# Load generation
+# -------------------------------------------------
+async def run_scenario(port: int, process: psutil.Process, endpoint: str, bodies: list[bytes],
+                       rows_per_request: int, concurrency: int, duration: float, warmup: float) -> dict:
+    connections = [Connection("127.0.0.1", port) for _ in range(concurrency)]
+    await asyncio.gather(*(c.open() for c in connections))
+    # Latencies of successful (< 400) requests only; rejected ones are just counted
+    latencies, statuses = [], {}
+    rss = []
+    measuring = False
+    stop_at = None
+
+    async def worker(i: int, connection: Connection):
+        n = i
+        while time.perf_counter() < stop_at:
+            body = bodies[n % len(bodies)]
+            n += concurrency
+            start = time.perf_counter()
+            status = await connection.post(endpoint, body)
+            if measuring:
+                if status < 400:
+                    latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+
+    async def sample_rss():
+        while True:
+            rss.append(process.memory_info().rss)
+            await asyncio.sleep(0.1)
+
+    try:
+        # Warm-up (lazy artifact loading, caches, connection setup) is not measured
+        stop_at = time.perf_counter() + warmup
+        await asyncio.gather(*(worker(i, c) for i, c in enumerate(connections)))
+        measuring = True
+        rss.append(process.memory_info().rss)
+        sampler = asyncio.create_task(sample_rss())
+        started = time.perf_counter()
+        stop_at = started + duration
+        await asyncio.gather(*(worker(i, c) for i, c in enumerate(connections)))
+        elapsed = time.perf_counter() - started
+        sampler.cancel()
+    finally:
+        for c in connections:
+            c.close()
+
+    requests = sum(statuses.values())
+    ms = np.asarray(latencies) * 1000
+    return {
+        "requests": requests,
+        "errors": requests - len(latencies),
+        "statuses": {str(status): count for status, count in sorted(statuses.items())},
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(requests / elapsed, 1),
+        "rows_per_sec": round(requests * rows_per_request / elapsed, 1),
+        # None when every request failed or was rejected
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 3),
+            "p50": round(float(np.percentile(ms, 50)), 3),
+            "p95": round(float(np.percentile(ms, 95)), 3),
+            "p99": round(float(np.percentile(ms, 99)), 3),
+            "max": round(float(ms.max()), 3),
+        } if latencies else None,
+        "rss_mb": {"peak": round(max(rss) / 1024 ** 2, 1), "end": round(rss[-1] / 1024 ** 2, 1)},
+    }
+
+
+def scenarios(app: str, traffic: list[str], concurrency: list[int], batch_sizes: list[int]):
+    """(endpoint, traffic, concurrency, batch size) combinations for one app"""
+    endpoints = [("/predict", 1)]
+    if app == "api_2":
+        endpoints += [(endpoint, size) for size in batch_sizes
+                      for endpoint in ("/batch_predict", "/batch_predict_columnar")]
+    for source in traffic:
+        for endpoint, size in endpoints:
+            for c in concurrency:
+                yield endpoint, source, c, size
+
+
+def scenario_key(result: dict) -> tuple:
+    return result["app"], result["endpoint"], result["traffic"], result["concurrency"], result["batch_size"]
+
+
+def run(args) -> dict:
+    sources = {"sample": sample_records, "synthetic": lambda: synthetic_records(10_000),
+               "log": lambda: log_records(args.log_path)}
+    records = {source: sources[source]() for source in args.traffic}
+    results = []
+    for app in args.apps:
+        port = free_port()
+        server = start_server(app, port)
+        process = psutil.Process(server.pid)
+        idle_rss = process.memory_info().rss
+        print(f"\n{app} on port {port} (idle RSS {idle_rss / 1024 ** 2:.0f} MB)")
+        print(f"{'endpoint':<26}{'traffic':<11}{'conc':>5}{'batch':>7}{'req/s':>9}{'rows/s':>11}"
+              f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'RSS MB':>8}")
+        try:
+            for endpoint, source, c, size in scenarios(app, args.traffic, args.concurrency, args.batch_sizes):
+                bodies = request_bodies(records[source], endpoint, size)
+                result = asyncio.run(run_scenario(port, process, endpoint, bodies, size, c, args.duration, args.warmup))
+                result = {"app": app, "endpoint": endpoint, "traffic": source, "concurrency": c,
+                          "batch_size": size, **result}
+                results.append(result)
+                latency = result["latency_ms"]
+                if latency is None:
+                    latency_columns = f"{'no successful requests':>27}"
+                else:
+                    latency_columns = f"{latency['p50']:>9.2f}{latency['p95']:>9.2f}{latency['p99']:>9.2f}"
+                print(f"{endpoint:<26}{source:<11}{c:>5}{size:>7}{result['requests_per_sec']:>9,.0f}"
+                      f"{result['rows_per_sec']:>11,.0f}{latency_columns}"
+                      f"{result['errors']:>8}{result['rss_mb']['peak']:>8.0f}")
+        finally:
+            stop_server(server)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "server_env": {name: os.environ[name] for name in SERVER_ENV if name in os.environ},
+        "settings": {"duration": args.duration, "warmup": args.warmup, "concurrency": args.concurrency,
+                     "batch_sizes": args.batch_sizes, "traffic": args.traffic},
+        "results": results,
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=BASE_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ("-dirty" if dirty else "")
+
+
+# -------------------------------------------------
+# Regression check
+# -------------------------------------------------
+def compare(current: dict, baseline: dict, tolerance: float) -> int:
+    """Print throughput and p95 changes per scenario; returns the number of regressions"""
+    previous = {scenario_key(r): r for r in baseline["results"]}
+    print(f"\nComparison with {baseline.get('commit')} (tolerance {tolerance:.0%})")
+    print(f"{'app':<7}{'endpoint':<26}{'traffic':<11}{'conc':>5}{'batch':>7}{'req/s':>10}{'p95':>10}")
+    regressions = 0
+    for result in current["results"]:
+        old = previous.get(scenario_key(result))
+        if old is None or not old["latency_ms"]:
+            continue
+        if not result["latency_ms"]:
+            # Succeeded in the baseline, nothing succeeds now
+            regressions += 1
+            print(f"{result['app']:<7}{result['endpoint']:<26}{result['traffic']:<11}{result['concurrency']:>5}"
+                  f"{result['batch_size']:>7}  no successful requests  REGRESSION")
+            continue
+        throughput = result["requests_per_sec"] / old["requests_per_sec"] - 1
+        p95 = result["latency_ms"]["p95"] / old["latency_ms"]["p95"] - 1
+        worse = throughput < -tolerance or p95 > tolerance
+        regressions += worse
+        print(f"{result['app']:<7}{result['endpoint']:<26}{result['traffic']:<11}{result['concurrency']:>5}"
+              f"{result['batch_size']:>7}{throughput:>+10.1%}{p95:>+10.1%}{'  REGRESSION' if worse else ''}")
+    return regressions
+
+
+def int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP load test of api and api_2")
+    parser.add_argument("--apps", nargs="+", choices=list(APPS), default=list(APPS))
+    parser.add_argument("--concurrency", type=int_list, default=[1, 16], help="Comma-separated client concurrency levels")
+    parser.add_argument("--batch-sizes", type=int_list, default=[100, 1000],
+                        help="Comma-separated records per request for api_2's batch endpoints")
+    parser.add_argument("--traffic", nargs="+", choices=["sample", "synthetic", "log"], default=["sample", "synthetic"])
+    parser.add_argument("--log-path", default=os.environ.get("PREDICTION_LOG_DIR", os.path.join(BASE_DIR, "prediction_logs")),
+                        help="Prediction log file or directory replayed by --traffic log")
+    parser.add_argument("--duration", type=float, default=5.0, help="Measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds before each scenario")
+    parser.add_argument("--output", help="Results JSON (default: benchmarks/results/load_<commit>_<time>.json)")
+    parser.add_argument("--compare", help="Baseline results JSON; exit with status 1 on regressions")
+    parser.add_argument("--current", help="With --compare: compare this saved results JSON instead of running")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed relative throughput drop / p95 increase before a regression is reported")
+    args = parser.parse_args()
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        current = run(args)
+        output = args.output or os.path.join(
+            RESULTS_DIR, f"load_{current['commit'] or 'unknown'}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as f:
+            json.dump(current, f, indent=2)
+        print("\n✅ Results saved to", output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
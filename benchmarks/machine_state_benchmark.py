@@ -0,0 +1,44 @@
+# machine_state_benchmark.py
+# Per-reading cost and memory of the /ws/predict rolling state
+# (api_2/machine_state.py): updates/sec for 1k-100k interleaved machine
+# streams at several window sizes, including LRU eviction when there are more
+# machines than slots. The update should not get slower with the window.
+#
+#     python benchmarks/machine_state_benchmark.py
+#     BENCH_READINGS=500000 python benchmarks/machine_state_benchmark.py
+import os
+import sys
+import time
+import numpy as np
+import psutil
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BASE_DIR, "api_2"))
+
+from machine_state import MachineStateStore
+
+READINGS = int(os.environ.get("BENCH_READINGS", 200_000))
+MAX_MACHINES = int(os.environ.get("BENCH_MAX_MACHINES", 50_000))
+
+rng = np.random.default_rng(0)
+wear = rng.uniform(0, 250, READINGS).tolist()
+delta = rng.normal(10, 1, READINGS).tolist()
+power = rng.normal(6.5, 1.5, READINGS).tolist()
+process = psutil.Process()
+
+print(f"{'machines':>9}{'window':>8}{'updates/s':>12}{'us/update':>11}{'store MB':>10}{'RSS +MB':>9}{'evicted':>9}")
+for machines in (1_000, 10_000, MAX_MACHINES, 2 * MAX_MACHINES):
+    ids = [f"M{i}" for i in range(machines)]
+    for window in (8, 32, 128):
+        rss = process.memory_info().rss
+        store = MachineStateStore(max_machines=MAX_MACHINES, window=window, idle_seconds=0)
+        now = 1.79e9
+        start = time.perf_counter()
+        for i in range(READINGS):
+            # Round-robin over the machines, one reading per second each
+            store.update(ids[i % machines], now + i // machines, wear[i], delta[i], power[i])
+        elapsed = time.perf_counter() - start
+        print(f"{machines:>9,}{window:>8}{READINGS / elapsed:>12,.0f}{elapsed / READINGS * 1e6:>11.2f}"
+              f"{store.memory_bytes / 1024 ** 2:>10.1f}{(process.memory_info().rss - rss) / 1024 ** 2:>9.1f}"
+              f"{store.evicted:>9,}")
+        del store
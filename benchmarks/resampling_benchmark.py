@@ -0,0 +1,67 @@
+# resampling_benchmark.py
+# SMOTE oversampling vs. in-training class weighting (scale_pos_weight) for
+# the LightGBM model: resampling time, training rows and matrix size, fit
+# time, and F1 / ROC-AUC on an untouched, imbalanced test split.
+#
+#     python benchmarks/resampling_benchmark.py
+#     BENCH_SCALE=20 python benchmarks/resampling_benchmark.py   # 20x the data
+import os
+import sys
+import time
+import numpy as np
+from sklearn.model_selection import train_test_split
+from sklearn.metrics import f1_score, roc_auc_score
+from lightgbm import LGBMClassifier
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+from resampling import balance_weight, encode_features, load_raw, smote
+
+# Historical data is simulated by stacking jittered copies of the dataset; for
+# SCALE > 1 only the timings mean anything, as copies leak across the split
+SCALE = int(os.environ.get("BENCH_SCALE", 1))
+N_JOBS = int(os.environ.get("BENCH_N_JOBS", -1))
+
+# -------------------------------------------------
+# Data: the same feature matrix resample_csv() feeds to SMOTE
+# -------------------------------------------------
+df = load_raw()
+X, _ = encode_features(df)
+y = df["Machine_failure"].to_numpy()
+if SCALE > 1:
+    rng = np.random.default_rng(0)
+    X = np.concatenate([X] + [X + rng.normal(0, 0.05, X.shape).astype(np.float32) for _ in range(SCALE - 1)])
+    y = np.tile(y, SCALE)
+
+# Resampling only ever touches the training split
+X_train, X_test, y_train, y_test = train_test_split(
+    X, y, test_size=0.2, stratify=y, random_state=42
+)
+
+
+def fit_and_score(X_fit, y_fit, **params):
+    model = LGBMClassifier(n_estimators=300, learning_rate=0.05, random_state=42, verbose=-1, **params)
+    start = time.perf_counter()
+    model.fit(X_fit, y_fit)
+    fit_seconds = time.perf_counter() - start
+    prob = model.predict_proba(X_test)[:, 1]
+    return fit_seconds, f1_score(y_test, (prob > 0.5).astype(int)), roc_auc_score(y_test, prob)
+
+
+results = []
+
+start = time.perf_counter()
+X_smote, y_smote = smote(X_train, y_train, n_jobs=N_JOBS)
+resample_seconds = time.perf_counter() - start
+results.append(("SMOTE (float32, chunked)", resample_seconds, X_smote, *fit_and_score(X_smote, y_smote)))
+
+weight = balance_weight(y_train)
+results.append((f"scale_pos_weight={weight:.1f}", 0.0, X_train,
+                *fit_and_score(X_train, y_train, scale_pos_weight=weight)))
+
+print(f"Train rows: {len(X_train):,} ({y_train.mean():.1%} failures), test rows: {len(X_test):,}, scale x{SCALE}\n")
+print(f"{'method':<26}{'resample s':>11}{'train rows':>12}{'matrix MB':>11}{'fit s':>8}{'F1':>8}{'ROC-AUC':>9}")
+for name, resample_s, X_fit, fit_s, f1, auc in results:
+    print(f"{name:<26}{resample_s:>11.2f}{len(X_fit):>12,}{X_fit.nbytes / 1024 ** 2:>11.1f}"
+          f"{fit_s:>8.2f}{f1:>8.4f}{auc:>9.4f}")
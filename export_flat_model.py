@@ -0,0 +1,75 @@
+# export_flat_model.py
+# Run after lightgbm_training.py: flattens the trained booster into NumPy
+# node arrays for the lightgbm-free "flat" engine in api_2/inference.py.
+import os
+import sys
+import joblib
+import numpy as np
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from serving.artifacts import ArtifactStore, file_sha256
+from serving.flat_model import FlatTreeModel, flatten_booster
+from serving.tree_shap import TreeExplainer
+from serving.registry import ModelRegistry
+
+# -------------------------------------------------
+# Paths
+# -------------------------------------------------
+ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
+MODEL_PATH = os.path.join(ARTIFACTS_DIR, "lightgbm_model.joblib")
+FLAT_MODEL_PATH = os.path.join(ARTIFACTS_DIR, "lightgbm_flat.npz")
+DATA_PATH = os.path.join(BASE_DIR, "Dataset", "ai4i2020_smote.csv")
+
+TOLERANCE = 1e-9
+# Rows whose TreeSHAP contributions are checked against pred_contrib (slow)
+SHAP_CHECK_ROWS = 500
+
+# -------------------------------------------------
+# Flatten
+# -------------------------------------------------
+# Recorded in the export, so serving can tell it belongs to this model
+model_sha256 = file_sha256(MODEL_PATH)
+model = joblib.load(MODEL_PATH)
+threshold = float(getattr(model, "decision_threshold_", 0.5))
+arrays = flatten_booster(model.booster_.dump_model(), decision_threshold=threshold)
+flat = FlatTreeModel(arrays)
+
+print(f"Trees: {len(arrays['roots'])}, internal nodes: {len(arrays['feature'])}, leaves: {len(arrays['leaf_value'])}")
+
+# -------------------------------------------------
+# Verify against predict_proba on the training data
+# -------------------------------------------------
+df = pd.read_csv(DATA_PATH)
+# Serving feature pipeline for this model's feature_name_
+X = ArtifactStore(ARTIFACTS_DIR, engine="lightgbm").pipeline.transform(df)
+
+expected = model.predict_proba(pd.DataFrame(X, columns=model.feature_name_))[:, 1]
+actual = flat.predict_proba(X)
+max_diff = float(np.max(np.abs(expected - actual)))
+
+print(f"Max |p_flat - p_lightgbm| over {len(X)} rows: {max_diff:.3e}")
+if max_diff > TOLERANCE:
+    raise ValueError(f"Flat model differs from LightGBM by {max_diff:.3e} (> {TOLERANCE})")
+
+# Explanations (serving/tree_shap.py) need the node counts saved alongside
+sample = X[:SHAP_CHECK_ROWS]
+expected = model.booster_.predict(sample, pred_contrib=True)
+actual = TreeExplainer(arrays).shap_values(sample)
+max_diff = float(np.max(np.abs(expected - actual)))
+
+print(f"Max |TreeSHAP - pred_contrib| over {len(sample)} rows: {max_diff:.3e}")
+if max_diff > TOLERANCE:
+    raise ValueError(f"TreeSHAP contributions differ from LightGBM by {max_diff:.3e} (> {TOLERANCE})")
+
+# -------------------------------------------------
+# Save
+# -------------------------------------------------
+np.savez(FLAT_MODEL_PATH, **arrays, model_sha256=np.array(model_sha256))
+print("✅ Flat model saved to", FLAT_MODEL_PATH)
+
+# Re-publish so the registry version carries the flat arrays too
+version = ModelRegistry(os.path.join(ARTIFACTS_DIR, "registry")).publish(ARTIFACTS_DIR)
+print("✅ Published model version", version)
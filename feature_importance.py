@@ -48,18 +48,10 @@ if not os.path.exists(MODEL_PATH):
 model = joblib.load(MODEL_PATH)
 
 # -------------------------------------------------
-# FEATURE NAMES (MUST MATCH TRAINING ORDER)
+# FEATURE NAMES (SAVED WITH THE MODEL, IN TRAINING ORDER)
 # -------------------------------------------------
 
-feature_names = [
-    "Product_ID",
-    "Type",
-    "Air_temperature",
-    "Process_temperature",
-    "Rotational_speed",
-    "Torque",
-    "Tool_wear"
-]
+feature_names = list(model.feature_name_)
 
 # -------------------------------------------------
 # EXTRACT FEATURE IMPORTANCE
@@ -0,0 +1,244 @@
+# lightgbm_stream_training.py
+# Out-of-core LightGBM training for datasets that don't fit in RAM:
+#
+#     python lightgbm_stream_training.py Dataset/sensor_logs.parquet --chunk-rows 200000
+#
+# The dataset (CSV or Parquet, raw or underscore column names) is only ever
+# read one chunk at a time:
+#   1. count rows, collect labels and Type values and grow the persistent
+#      Product_ID vocabulary;
+#   2. LightGBM builds the binned Datasets from lgb.Sequence views of the
+#      file, which it reads front to back: a row-by-row pass over its bin
+#      sample, then one chunked pass per split to push the encoded rows.
+# Only one raw chunk is held at once; the binned Dataset itself needs about
+# one byte per feature per row. Type uses the serving LabelEncoder, and the
+# model is saved and published to the registry like lightgbm_training.py's.
+import os
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+import psutil
+import joblib
+import lightgbm as lgb
+import pyarrow.parquet as pq
+from lightgbm import LGBMClassifier
+from sklearn.preprocessing import LabelEncoder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from serving.features import FEATURES, RAW_COLUMNS, TARGET, FeaturePipeline
+from serving.registry import ModelRegistry
+from serving.vocabulary import ProductVocabulary
+
+# -------------------------------------------------
+# Paths & settings
+# -------------------------------------------------
+ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
+# Shared with lightgbm_training.py and the APIs
+PRODUCT_VOCABULARY_PATH = os.path.join(ARTIFACTS_DIR, "product_vocabulary.npz")
+TYPE_ENCODER_PATH = os.path.join(ARTIFACTS_DIR, "type_encoder.joblib")
+MODEL_PATH = os.path.join(ARTIFACTS_DIR, "lightgbm_model.joblib")
+
+# Every VALID_EVERY-th row is held out for validation
+VALID_EVERY = 5
+DECISION_THRESHOLD = 0.5
+
+PARAMS = {
+    "objective": "binary",
+    "metric": ["auc", "binary_logloss"],
+    "learning_rate": 0.05,
+    "num_leaves": 31,
+    "bin_construct_sample_cnt": 200_000,
+    "max_bin": 255,
+    "seed": 42,
+    "verbose": -1,
+}
+
+
+# -------------------------------------------------
+# Chunked reading
+# -------------------------------------------------
+def iter_chunks(path: str, chunk_rows: int):
+    """DataFrames of at most chunk_rows rows with FEATURES + TARGET columns"""
+    if path.endswith(".parquet"):
+        reader = pq.ParquetFile(path)
+        names = [RAW_COLUMNS.get(name, name) for name in reader.schema_arrow.names]
+        wanted = [raw for raw, name in zip(reader.schema_arrow.names, names) if name in FEATURES + [TARGET]]
+        batches = (batch.to_pandas() for batch in reader.iter_batches(batch_size=chunk_rows, columns=wanted))
+    else:
+        batches = pd.read_csv(path, chunksize=chunk_rows, encoding="utf-8-sig",
+                              dtype={"Product ID": str, "Product_ID": str, "Type": str})
+    for chunk in batches:
+        yield chunk.rename(columns=RAW_COLUMNS)[FEATURES + [TARGET]]
+
+
+# -------------------------------------------------
+# Pass 1: row counts, labels, vocabulary
+# -------------------------------------------------
+def scan(path: str, chunk_rows: int, products: ProductVocabulary):
+    """Train/validation labels and the sorted Type values; new Product IDs are added to `products`"""
+    y_train, y_valid, types = [], [], set()
+    seen = 0
+    for chunk in iter_chunks(path, chunk_rows):
+        codes = products.encode(chunk["Product_ID"], grow=True)
+        if (codes < 0).any():
+            raise ValueError(f"Malformed Product_ID values: {chunk['Product_ID'][codes < 0].head().tolist()}")
+        types.update(chunk["Type"].astype(str).unique())
+
+        y = chunk[TARGET].to_numpy(dtype=np.float32)
+        is_valid = np.arange(seen, seen + len(y)) % VALID_EVERY == 0
+        y_train.append(y[~is_valid])
+        y_valid.append(y[is_valid])
+        seen += len(y)
+
+    return np.concatenate(y_train), np.concatenate(y_valid), sorted(types)
+
+
+# -------------------------------------------------
+# Pass 2: lgb.Sequence over one split of the file
+# -------------------------------------------------
+class ChunkedSequence(lgb.Sequence):
+    """Encoded rows of one split (training or validation) of a chunked file.
+
+    LightGBM reads a Sequence in increasing row order, so a cursor over the
+    file's chunks serves both its row-by-row sampling and its batch pushes;
+    asking for an earlier row starts a new pass over the file.
+    """
+
+    def __init__(self, path: str, chunk_rows: int, pipeline: FeaturePipeline, valid: bool, length: int):
+        self.path = path
+        self.batch_size = chunk_rows
+        self.pipeline = pipeline
+        self.valid = valid
+        self.length = length
+        self.peak_rss = 0
+        self._rewind()
+
+    def __len__(self) -> int:
+        return self.length
+
+    def _rewind(self):
+        self._chunks = self._encoded_chunks()
+        self._block = np.empty((0, len(FEATURES)), dtype=np.float64)
+        self._offset = 0
+
+    def _encoded_chunks(self):
+        seen = 0
+        for chunk in iter_chunks(self.path, self.batch_size):
+            X = self.pipeline.transform(chunk)
+            is_valid = np.arange(seen, seen + len(X)) % VALID_EVERY == 0
+            seen += len(X)
+            self.peak_rss = max(self.peak_rss, psutil.Process().memory_info().rss)
+            yield X[is_valid] if self.valid else X[~is_valid]
+
+    def _seek(self, row: int):
+        """Make the current block hold `row`"""
+        if row < self._offset:
+            self._rewind()
+        while row >= self._offset + len(self._block):
+            self._offset += len(self._block)
+            self._block = next(self._chunks)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            start, stop, _ = idx.indices(self.length)
+            parts = []
+            while start < stop:
+                self._seek(start)
+                part = self._block[start - self._offset:stop - self._offset]
+                parts.append(part)
+                start += len(part)
+            return np.concatenate(parts) if len(parts) != 1 else parts[0]
+        if isinstance(idx, (list, np.ndarray)):
+            return np.stack([self[int(i)] for i in idx])
+        self._seek(idx)
+        return self._block[idx - self._offset]
+
+
+def build_datasets(train_rows: ChunkedSequence, y_train: np.ndarray, valid_rows: ChunkedSequence,
+                   y_valid: np.ndarray):
+    train = lgb.Dataset(train_rows, label=y_train, params=PARAMS, feature_name=FEATURES).construct()
+    # Same bin edges as the training Dataset
+    valid = lgb.Dataset(valid_rows, label=y_valid, reference=train, params=PARAMS,
+                        feature_name=FEATURES).construct()
+    return train, valid
+
+
+def to_classifier(booster: lgb.Booster, train_rows: ChunkedSequence, y_train: np.ndarray) -> LGBMClassifier:
+    """LGBMClassifier holding `booster`, in the lightgbm_model.joblib format the APIs load.
+
+    The estimator is fitted for one round on a few rows of each class, to set
+    up its classes and feature names, then its booster is replaced by the
+    streamed model.
+    """
+    rows = np.sort(np.concatenate([np.flatnonzero(y_train == label)[:100] for label in (0, 1)]))
+    X = pd.DataFrame(train_rows[rows], columns=FEATURES)
+    model = LGBMClassifier(n_estimators=1, verbose=-1).fit(X, y_train[rows])
+    model.booster_.model_from_string(booster.model_to_string())
+    model.decision_threshold_ = DECISION_THRESHOLD
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train LightGBM on a CSV/Parquet dataset larger than RAM")
+    parser.add_argument("data", help="CSV or .parquet file with the ai4i2020 columns")
+    parser.add_argument("--chunk-rows", type=int, default=100_000, help="Rows read and encoded at a time")
+    parser.add_argument("--rounds", type=int, default=300, help="Boosting rounds")
+    args = parser.parse_args()
+
+    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+    if os.path.exists(PRODUCT_VOCABULARY_PATH):
+        products = ProductVocabulary.load(PRODUCT_VOCABULARY_PATH)
+    else:
+        products = ProductVocabulary()
+    known = len(products)
+
+    start = time.perf_counter()
+    y_train, y_valid, types = scan(args.data, args.chunk_rows, products)
+    print(f"Pass 1: {len(y_train) + len(y_valid):,} rows, {len(products) - known} new Product IDs "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    # Same encoders the APIs load from the published bundle
+    type_encoder = LabelEncoder().fit(types)
+    pipeline = FeaturePipeline(
+        {"Product_ID": products.encode, "Type": type_encoder.transform},
+        features=FEATURES,
+    )
+
+    start = time.perf_counter()
+    train_rows = ChunkedSequence(args.data, args.chunk_rows, pipeline, valid=False, length=len(y_train))
+    valid_rows = ChunkedSequence(args.data, args.chunk_rows, pipeline, valid=True, length=len(y_valid))
+    train, valid = build_datasets(train_rows, y_train, valid_rows, y_valid)
+    peak_rss = max(train_rows.peak_rss, valid_rows.peak_rss)
+    print(f"Pass 2: binned {len(y_train):,} train / {len(y_valid):,} validation rows "
+          f"({time.perf_counter() - start:.1f}s)")
+
+    start = time.perf_counter()
+    evals = {}
+    booster = lgb.train(PARAMS, train, num_boost_round=args.rounds, valid_sets=[valid],
+                        valid_names=["valid"], callbacks=[lgb.record_evaluation(evals)])
+    print(f"Trained {args.rounds} rounds in {time.perf_counter() - start:.1f}s")
+    print("Validation AUC:", evals["valid"]["auc"][-1], "logloss:", evals["valid"]["binary_logloss"][-1])
+    print(f"Peak RSS while loading: {peak_rss / 1024 ** 2:.0f} MB")
+
+    # -------------------------------------------------
+    # Save
+    # -------------------------------------------------
+    model = to_classifier(booster, train_rows, y_train)
+    joblib.dump(model, MODEL_PATH)
+    joblib.dump(type_encoder, TYPE_ENCODER_PATH)
+    products.save(PRODUCT_VOCABULARY_PATH)
+    print("✅ Model saved to", MODEL_PATH)
+
+    # -------------------------------------------------
+    # Publish a content-hashed version for the APIs to hot-reload
+    # -------------------------------------------------
+    version = ModelRegistry(os.path.join(ARTIFACTS_DIR, "registry")).publish(ARTIFACTS_DIR)
+    print("✅ Published model version", version)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 # lightgbm_training.py
 import os
+import json
+import argparse
+from functools import partial
 import pandas as pd
 import joblib
 from sklearn.model_selection import train_test_split
@@ -7,39 +10,73 @@ from sklearn.preprocessing import LabelEncoder
 from sklearn.metrics import f1_score, roc_auc_score
 from lightgbm import LGBMClassifier
 
+from serving.features import DERIVED, FEATURES, TARGET, FeaturePipeline
+from serving.registry import ModelRegistry
+from serving.vocabulary import ProductVocabulary
+from resampling import balance_weight, load_raw
+from lightgbm_tuning import sklearn_params
+
 # -------------------------------------------------
 # Paths
 # -------------------------------------------------
-DATA_PATH = r"D:\projects\Machine_failure_ai4i2020_dataset\Dataset\ai4i2020_smote.csv"
-ARTIFACTS_DIR = r"D:\projects\Machine_failure_ai4i2020_dataset\artifacts"
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "Dataset", "ai4i2020_smote.csv")
+ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
 os.makedirs(ARTIFACTS_DIR, exist_ok=True)
 
+# Probability above which a record is labelled as failure at serving time
+DECISION_THRESHOLD = 0.5
+
+parser = argparse.ArgumentParser(description="Train the serving LightGBM model")
+parser.add_argument("--tuned", action="store_true",
+                    help="Use the best parameters found by lightgbm_tuning.py")
+parser.add_argument("--class-weight", action="store_true",
+                    help="Train on the original imbalanced ai4i2020.csv with scale_pos_weight instead of the SMOTE dataset")
+parser.add_argument("--derived-features", action="store_true",
+                    help=f"Also train on the derived features {list(DERIVED)}")
+args = parser.parse_args()
+
 # -------------------------------------------------
 # Load data
 # -------------------------------------------------
-df = pd.read_csv(DATA_PATH)
+if args.class_weight:
+    df = load_raw(os.path.join(os.path.dirname(DATA_PATH), "ai4i2020.csv"))
+else:
+    df = pd.read_csv(DATA_PATH)
 
 # -------------------------------------------------
-# DROP NON-SENSOR COLUMNS (CRITICAL)
+# Encode categorical columns
 # -------------------------------------------------
-drop_cols = ["UDI", "TWF", "HDF", "PWF", "OSF", "RNF"]
-df = df.drop(columns=drop_cols)
+# Product IDs keep the codes of earlier runs; new IDs are appended
+vocabulary_path = os.path.join(ARTIFACTS_DIR, "product_vocabulary.npz")
+if os.path.exists(vocabulary_path):
+    product_vocabulary = ProductVocabulary.load(vocabulary_path)
+else:
+    product_vocabulary = ProductVocabulary()
+
+le = LabelEncoder().fit(df["Type"])
+joblib.dump(le, os.path.join(ARTIFACTS_DIR, "type_encoder.joblib"))
 
 # -------------------------------------------------
-# Encode categorical columns
+# Build features (serving/features.py, same pipeline as the APIs).
+# Only feature inputs are read, so UDI and the failure-mode columns
+# (TWF, HDF, PWF, OSF, RNF) never reach the model.
 # -------------------------------------------------
-encoders = {}
-for col in ["Product_ID", "Type"]:
-    le = LabelEncoder()
-    df[col] = le.fit_transform(df[col])
-    encoders[col] = le
-    joblib.dump(le, os.path.join(ARTIFACTS_DIR, f"{col.lower()}_encoder.joblib"))
+pipeline = FeaturePipeline(
+    {"Product_ID": partial(product_vocabulary.encode, grow=True), "Type": le.transform},
+    features=FEATURES + list(DERIVED) if args.derived_features else FEATURES,
+)
+X = pd.DataFrame(pipeline.transform(df), columns=pipeline.features, index=df.index)
+# Type was fitted on this data, so only malformed Product IDs can be left unencoded
+unseen = pipeline.unseen(X.to_numpy())
+if unseen:
+    raise ValueError(f"Malformed Product_ID values: {df['Product_ID'].iloc[unseen['Product_ID'][:5]].tolist()}")
+product_vocabulary.save(vocabulary_path)
 
 # -------------------------------------------------
 # Split
 # -------------------------------------------------
-X = df.drop("Machine_failure", axis=1)
-y = df["Machine_failure"]
+y = df[TARGET]
 
 print("✅ Training features:", list(X.columns))
 
@@ -50,19 +87,33 @@ X_train, X_test, y_train, y_test = train_test_split(
 # -------------------------------------------------
 # Train
 # -------------------------------------------------
+params = {"n_estimators": 300, "learning_rate": 0.05}
+if args.tuned:
+    with open(os.path.join(ARTIFACTS_DIR, "lightgbm_search_log.json")) as f:
+        best = json.load(f)["best"]
+    # Early stopping picked the round count on the tuning validation fold
+    params = {**sklearn_params(best["config"]), "n_estimators": best["best_iteration"]}
+    print("✅ Tuned parameters:", params)
+
+if args.class_weight:
+    # Weights the failures instead of materializing SMOTE's synthetic rows
+    params["scale_pos_weight"] = balance_weight(y_train)
+
 model = LGBMClassifier(
-    n_estimators=300,
-    learning_rate=0.05,
+    **params,
     random_state=42
 )
 
 model.fit(X_train, y_train)
 
+# Stored on the estimator so it ships inside lightgbm_model.joblib
+model.decision_threshold_ = DECISION_THRESHOLD
+
 # -------------------------------------------------
 # Evaluate
 # -------------------------------------------------
-y_pred = model.predict(X_test)
 y_prob = model.predict_proba(X_test)[:, 1]
+y_pred = (y_prob > model.decision_threshold_).astype(int)
 
 print("F1:", f1_score(y_test, y_pred))
 print("ROC-AUC:", roc_auc_score(y_test, y_prob))
@@ -72,3 +123,10 @@ print("ROC-AUC:", roc_auc_score(y_test, y_prob))
 # -------------------------------------------------
 joblib.dump(model, os.path.join(ARTIFACTS_DIR, "lightgbm_model.joblib"))
 print("✅ Model saved")
+
+# -------------------------------------------------
+# Publish a content-hashed version for the APIs to hot-reload
+# (run export_flat_model.py afterwards to add the flat engine's arrays)
+# -------------------------------------------------
+version = ModelRegistry(os.path.join(ARTIFACTS_DIR, "registry")).publish(ARTIFACTS_DIR)
+print("✅ Published model version", version)
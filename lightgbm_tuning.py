@@ -0,0 +1,243 @@
+# lightgbm_tuning.py
+# Successive-halving hyperparameter search for LightGBM:
+#
+#     python lightgbm_tuning.py --workers 4
+#     python lightgbm_training.py --tuned     # retrain with the best parameters
+#
+# Every config starts on a small round budget; after each rung only the best
+# 1/ETA continue, with ETA times more rounds. Trials early-stop on a
+# validation fold and run in parallel worker processes. The training and
+# validation folds are binned once into lgb.Dataset binaries that all trials
+# load, so histograms are never rebuilt per trial.
+import os
+import json
+import math
+import time
+import argparse
+from functools import partial
+import numpy as np
+import pandas as pd
+import lightgbm as lgb
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import LabelEncoder
+
+from serving.features import FEATURES, TARGET, FeaturePipeline
+from serving.vocabulary import ProductVocabulary
+
+# -------------------------------------------------
+# Paths
+# -------------------------------------------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(BASE_DIR, "Dataset", "ai4i2020_smote.csv")
+ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
+PRODUCT_VOCABULARY_PATH = os.path.join(ARTIFACTS_DIR, "product_vocabulary.npz")
+SEARCH_LOG_PATH = os.path.join(ARTIFACTS_DIR, "lightgbm_search_log.json")
+BOOSTER_PATH = os.path.join(ARTIFACTS_DIR, "lightgbm_tuned_booster.txt")
+
+# -------------------------------------------------
+# Search settings
+# -------------------------------------------------
+ETA = 3
+MIN_ROUNDS = 40
+MAX_ROUNDS = 1080
+EARLY_STOPPING_ROUNDS = 30
+VALID_SIZE = 0.2
+SEED = 42
+
+# Fixed for every trial: changing these would require re-binning the Dataset
+DATASET_PARAMS = {"max_bin": 255, "feature_pre_filter": False, "verbose": -1}
+
+# LightGBM native names in sample_config() -> LGBMClassifier arguments
+SKLEARN_NAMES = {
+    "min_data_in_leaf": "min_child_samples",
+    "lambda_l1": "reg_alpha",
+    "lambda_l2": "reg_lambda",
+    "feature_fraction": "colsample_bytree",
+    "bagging_fraction": "subsample",
+    "bagging_freq": "subsample_freq",
+}
+
+
+def sample_config(rng: np.random.Generator) -> dict:
+    return {
+        "num_leaves": int(rng.choice([15, 31, 63, 127])),
+        "max_depth": int(rng.choice([-1, 6, 10])),
+        "learning_rate": float(np.exp(rng.uniform(np.log(0.02), np.log(0.2)))),
+        "min_data_in_leaf": int(rng.choice([5, 10, 20, 40, 80])),
+        "feature_fraction": float(rng.uniform(0.6, 1.0)),
+        "bagging_fraction": float(rng.uniform(0.6, 1.0)),
+        "bagging_freq": 1,
+        "lambda_l2": float(np.exp(rng.uniform(np.log(1e-3), np.log(10.0)))),
+    }
+
+
+def sklearn_params(config: dict) -> dict:
+    """A searched config as LGBMClassifier arguments, so the tuned values replace
+    its defaults instead of being passed next to them"""
+    return {SKLEARN_NAMES.get(name, name): value for name, value in config.items()}
+
+
+# -------------------------------------------------
+# Data: same features and held-out test split as lightgbm_training.py
+# -------------------------------------------------
+def load_training_split():
+    df = pd.read_csv(DATA_PATH)
+    # Same Product_ID codes as the served model; unseen IDs only grow this copy
+    if os.path.exists(PRODUCT_VOCABULARY_PATH):
+        product_vocabulary = ProductVocabulary.load(PRODUCT_VOCABULARY_PATH)
+    else:
+        product_vocabulary = ProductVocabulary()
+    pipeline = FeaturePipeline({
+        "Product_ID": partial(product_vocabulary.encode, grow=True),
+        "Type": LabelEncoder().fit(df["Type"]).transform,
+    }, features=FEATURES)
+
+    X = pd.DataFrame(pipeline.transform(df), columns=pipeline.features, index=df.index)
+    y = df[TARGET]
+    # The test split is left untouched for lightgbm_training.py's evaluation
+    X_train, _, y_train, _ = train_test_split(
+        X, y, test_size=0.2, stratify=y, random_state=42
+    )
+    return X_train, y_train
+
+
+# -------------------------------------------------
+# Shared binned datasets
+# -------------------------------------------------
+def build_datasets(X, y, cache_dir: str):
+    """Split off a validation fold, bin both once and save them as lgb.Dataset binaries"""
+    X_fit, X_valid, y_fit, y_valid = train_test_split(
+        X, y, test_size=VALID_SIZE, stratify=y, random_state=SEED
+    )
+    os.makedirs(cache_dir, exist_ok=True)
+    train_path = os.path.join(cache_dir, "tuning_train.bin")
+    valid_path = os.path.join(cache_dir, "tuning_valid.bin")
+    for path in (train_path, valid_path):
+        # save_binary refuses to overwrite
+        if os.path.exists(path):
+            os.remove(path)
+
+    train = lgb.Dataset(X_fit, label=y_fit, params=DATASET_PARAMS, free_raw_data=False)
+    # The validation fold reuses the training bin boundaries
+    valid = lgb.Dataset(X_valid, label=y_valid, reference=train, params=DATASET_PARAMS)
+    train.save_binary(train_path)
+    valid.save_binary(valid_path)
+    return train_path, valid_path
+
+
+_datasets = None
+
+
+def _init_worker(train_path: str, valid_path: str):
+    # Loaded once per worker process and reused by every trial it runs
+    global _datasets
+    train = lgb.Dataset(train_path, params=DATASET_PARAMS).construct()
+    valid = lgb.Dataset(valid_path, reference=train, params=DATASET_PARAMS).construct()
+    _datasets = train, valid
+
+
+def run_trial(task) -> dict:
+    trial_id, config, rounds, num_threads = task
+    train, valid = _datasets
+    params = {
+        "objective": "binary",
+        "metric": ["binary_logloss", "auc"],
+        "first_metric_only": True,
+        "num_threads": num_threads,
+        "seed": SEED,
+        "verbose": -1,
+        **DATASET_PARAMS,
+        **config,
+    }
+
+    start = time.perf_counter()
+    booster = lgb.train(
+        params,
+        train,
+        num_boost_round=rounds,
+        valid_sets=[valid],
+        valid_names=["valid"],
+        callbacks=[lgb.early_stopping(EARLY_STOPPING_ROUNDS, first_metric_only=True, verbose=False)],
+    )
+    best = booster.best_score["valid"]
+    return {
+        "trial": trial_id,
+        "config": config,
+        "rounds": rounds,
+        "best_iteration": booster.best_iteration,
+        "valid_logloss": best["binary_logloss"],
+        "valid_auc": best["auc"],
+        "seconds": round(time.perf_counter() - start, 3),
+        "model": booster.model_to_string(num_iteration=booster.best_iteration),
+    }
+
+
+# -------------------------------------------------
+# Successive halving
+# -------------------------------------------------
+def tune(X, y, artifacts_dir: str = ARTIFACTS_DIR, workers: int | None = None) -> dict:
+    """Search LightGBM parameters on (X, y); writes the best booster and the
+    search log to artifacts_dir and returns the best trial"""
+    workers = max(1, workers or os.cpu_count() or 1)
+    num_threads = max(1, (os.cpu_count() or 1) // workers)
+    rungs = int(math.log(MAX_ROUNDS / MIN_ROUNDS, ETA)) + 1
+    n_configs = ETA ** (rungs - 1)
+
+    train_path, valid_path = build_datasets(X, y, os.path.join(artifacts_dir, "cache"))
+
+    rng = np.random.default_rng(SEED)
+    survivors = [(trial_id, sample_config(rng)) for trial_id in range(n_configs)]
+    log = []
+    best = None
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(train_path, valid_path)) as pool:
+        for rung in range(rungs):
+            rounds = min(MIN_ROUNDS * ETA ** rung, MAX_ROUNDS)
+            tasks = [(trial_id, config, rounds, num_threads) for trial_id, config in survivors]
+            results = sorted(pool.map(run_trial, tasks), key=lambda r: r["valid_logloss"])
+
+            for result in results:
+                log.append({"rung": rung, **{k: v for k, v in result.items() if k != "model"}})
+            print(f"Rung {rung}: {len(results)} configs x {rounds} rounds, "
+                  f"best valid logloss {results[0]['valid_logloss']:.5f} (trial {results[0]['trial']})")
+
+            best = results[0]
+            keep = max(1, len(results) // ETA)
+            survivors = [(r["trial"], r["config"]) for r in results[:keep]]
+
+    elapsed = time.perf_counter() - start
+    print(f"✅ Search finished: {len(log)} trials in {elapsed:.1f}s")
+
+    booster_path = os.path.join(artifacts_dir, os.path.basename(BOOSTER_PATH))
+    with open(booster_path, "w") as f:
+        f.write(best["model"])
+    with open(os.path.join(artifacts_dir, os.path.basename(SEARCH_LOG_PATH)), "w") as f:
+        json.dump({
+            "eta": ETA,
+            "min_rounds": MIN_ROUNDS,
+            "max_rounds": MAX_ROUNDS,
+            "workers": workers,
+            "seconds": round(elapsed, 2),
+            "best": {k: v for k, v in best.items() if k != "model"},
+            "trials": log,
+        }, f, indent=2)
+    print("✅ Best booster saved to", booster_path)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Successive-halving search over LightGBM parameters")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Trials run in parallel")
+    args = parser.parse_args()
+
+    X_train, y_train = load_training_split()
+    best = tune(X_train, y_train, ARTIFACTS_DIR, workers=args.workers)
+    print(f"Best: valid logloss {best['valid_logloss']:.5f}, AUC {best['valid_auc']:.5f}, "
+          f"{best['best_iteration']} rounds, {best['config']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# resampling.py
+# Class balancing for the AI4I 2020 data, used by resampling_dataset.py,
+# lightgbm_training.py and benchmarks/resampling_benchmark.py.
+#
+# smote() follows imblearn's SMOTE (each synthetic row interpolates between a
+# minority row and one of its k nearest minority neighbours) on a float32
+# matrix. The neighbour search and the interpolation run chunk by chunk, so
+# memory is bounded by chunk_size rather than by the minority class size.
+# balance_weight() is the in-training alternative: no extra rows, the
+# minority class is weighted instead.
+import os
+import sys
+import json
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import LabelEncoder
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from serving.features import FEATURES, RAW_COLUMNS, TARGET
+from serving.registry import file_sha256
+
+RAW_DATA_PATH = os.path.join(BASE_DIR, "Dataset", "ai4i2020.csv")
+SMOTE_DATA_PATH = os.path.join(BASE_DIR, "Dataset", "ai4i2020_smote.csv")
+CACHE_DIR = os.path.join(BASE_DIR, "artifacts", "cache", "resampling")
+
+categorical_cols = ["Product_ID", "Type"]
+
+
+def load_raw(path: str = RAW_DATA_PATH) -> pd.DataFrame:
+    """Original AI4I 2020 CSV with the underscore column names used everywhere else"""
+    return pd.read_csv(path, encoding="utf-8-sig").rename(columns=RAW_COLUMNS)
+
+
+def encode_features(df: pd.DataFrame):
+    """float32 matrix of the model FEATURES only (no UDI row IDs or failure-mode
+    flags) with label-encoded categoricals, and the fitted encoders"""
+    encoders = {col: LabelEncoder().fit(df[col]) for col in categorical_cols}
+    X = np.empty((len(df), len(FEATURES)), dtype=np.float32)
+    for j, col in enumerate(FEATURES):
+        X[:, j] = encoders[col].transform(df[col]) if col in encoders else df[col]
+    return X, encoders
+
+
+# -----------------------------
+# SMOTE on float32, chunked & parallel
+# -----------------------------
+def smote(X: np.ndarray, y: np.ndarray, k_neighbors: int = 5, n_jobs: int | None = None,
+          chunk_size: int = 4096, random_state: int = 42):
+    """Oversample the minority class of binary `y` up to the majority count.
+
+    Returns (X_res, y_res): the original rows followed by the synthetic ones,
+    all float32.
+    """
+    X = np.ascontiguousarray(X, dtype=np.float32)
+    y = np.asarray(y)
+    classes, counts = np.unique(y, return_counts=True)
+    minority = classes[np.argmin(counts)]
+    n_new = counts.max() - counts.min()
+    X_min = X[y == minority]
+    if n_new == 0 or len(X_min) < 2:
+        return X, y
+
+    k = min(k_neighbors, len(X_min) - 1)
+    nn = NearestNeighbors(n_neighbors=k + 1, n_jobs=n_jobs).fit(X_min)
+    # Each chunk's query is split across n_jobs cores; column 0 is the row itself
+    neighbors = np.empty((len(X_min), k), dtype=np.int64)
+    for start in range(0, len(X_min), chunk_size):
+        stop = start + chunk_size
+        neighbors[start:stop] = nn.kneighbors(X_min[start:stop], return_distance=False)[:, 1:]
+
+    rng = np.random.default_rng(random_state)
+    picks = rng.integers(0, len(X_min) * k, size=n_new)
+    X_new = np.empty((n_new, X.shape[1]), dtype=np.float32)
+    for start in range(0, n_new, chunk_size):
+        chunk = picks[start:start + chunk_size]
+        base = X_min[chunk // k]
+        neighbor = X_min[neighbors[chunk // k, chunk % k]]
+        gap = rng.random((len(chunk), 1), dtype=np.float32)
+        X_new[start:start + len(chunk)] = base + gap * (neighbor - base)
+
+    X_res = np.concatenate([X, X_new])
+    y_res = np.concatenate([y, np.full(n_new, minority, dtype=y.dtype)])
+    return X_res, y_res
+
+
+def balance_weight(y) -> float:
+    """LightGBM/XGBoost scale_pos_weight that balances the classes without resampling"""
+    y = np.asarray(y)
+    positives = int((y == 1).sum())
+    return (len(y) - positives) / max(positives, 1)
+
+
+# -----------------------------
+# Cached CSV -> balanced CSV
+# -----------------------------
+def resample_csv(input_path: str = RAW_DATA_PATH, output_path: str = SMOTE_DATA_PATH,
+                 n_jobs: int | None = None, force: bool = False) -> bool:
+    """Write the SMOTE-balanced dataset; returns False when the cached output
+    for this exact input (by SHA-256) is still in place"""
+    # Records which input produced output_path; kept out of the Dataset folder
+    meta_path = os.path.join(CACHE_DIR, os.path.basename(output_path) + ".json")
+    key = {"input_sha256": file_sha256(input_path), "method": "smote-float32-features", "k_neighbors": 5,
+           "random_state": 42}
+    if not force and os.path.exists(output_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f) == key:
+                return False
+
+    df = load_raw(input_path)
+    # Neighbours and interpolation on the model features only, so UDI's scale
+    # doesn't dominate the distances and no row IDs or failure flags are synthesized
+    X, encoders = encode_features(df)
+    X_res, y_res = smote(X, df[TARGET].to_numpy(), n_jobs=n_jobs)
+
+    df_resampled = pd.DataFrame(X_res, columns=FEATURES)
+    # Integer columns go back to integers (truncating, as imblearn did)
+    for col in FEATURES:
+        if col in encoders:
+            df_resampled[col] = df_resampled[col].astype(np.int64)
+        elif pd.api.types.is_integer_dtype(df[col]):
+            df_resampled[col] = df_resampled[col].astype(df[col].dtype)
+    df_resampled[TARGET] = y_res
+    for col in categorical_cols:
+        df_resampled[col] = encoders[col].inverse_transform(df_resampled[col])
+
+    df_resampled.to_csv(output_path, index=False)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(meta_path, "w") as f:
+        json.dump(key, f, indent=2)
+    return True
@@ -1,75 +1,32 @@
+import argparse
+import time
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder
-from imblearn.over_sampling import SMOTE
 
-# -----------------------------
-# 1. Load data
-# -----------------------------
-df = pd.read_csv(r"D:\projects\Machine_failure_ai4i2020_dataset\Dataset\ai4i2020.csv")
-
-# -----------------------------
-# 2. Rename columns
-# -----------------------------
-df.rename(columns={
-    'UDI': 'UDI',
-    'Product ID': 'Product_ID',
-    'Type': 'Type',
-    'Air temperature [K]': 'Air_temperature',
-    'Process temperature [K]': 'Process_temperature',
-    'Rotational speed [rpm]': 'Rotational_speed',
-    'Torque [Nm]': 'Torque',
-    'Tool wear [min]': 'Tool_wear',
-    'Machine failure': 'Machine_failure',
-    'TWF': 'TWF',
-    'HDF': 'HDF',
-    'PWF': 'PWF',
-    'OSF': 'OSF',
-    'RNF': 'RNF'
-}, inplace=True)
+from resampling import RAW_DATA_PATH, SMOTE_DATA_PATH, resample_csv
 
 # -----------------------------
-# 3. Label encode categorical columns
+# 1. Options
 # -----------------------------
-categorical_cols = ['Product_ID', 'Type']
-
-encoders = {}
-for col in categorical_cols:
-    enc = LabelEncoder()
-    df[col] = enc.fit_transform(df[col])
-    encoders[col] = enc
+parser = argparse.ArgumentParser(description="Balance ai4i2020.csv with SMOTE (cached by input hash)")
+parser.add_argument("--input", default=RAW_DATA_PATH)
+parser.add_argument("--output", default=SMOTE_DATA_PATH)
+parser.add_argument("--n-jobs", type=int, default=-1, help="Cores for the neighbour search (-1 = all)")
+parser.add_argument("--force", action="store_true", help="Resample even if the cached output is current")
+args = parser.parse_args()
 
 # -----------------------------
-# 4. Separate features & target
+# 2. Load, encode, SMOTE & save (skipped when the input is unchanged)
 # -----------------------------
-X = df.drop("Machine_failure", axis=1)
-y = df["Machine_failure"]
+start = time.perf_counter()
+if not resample_csv(args.input, args.output, n_jobs=args.n_jobs, force=args.force):
+    print(f"Balanced dataset is up to date: {args.output}")
+else:
+    print(f"Balanced dataset saved as: {args.output} ({time.perf_counter() - start:.2f}s)")
 
 # -----------------------------
-# 5. Apply SMOTE (no column increase)
-# -----------------------------
-sm = SMOTE(random_state=42)
-X_res, y_res = sm.fit_resample(X, y)
-
+# 3. Summary
 # -----------------------------
-# 6. Combine back into DataFrame
-# -----------------------------
-df_resampled = pd.DataFrame(X_res, columns=X.columns)
-df_resampled["Machine_failure"] = y_res
-
-# -----------------------------
-# 7. Reverse Label Encoding (optional)
-# -----------------------------
-for col in categorical_cols:
-    df_resampled[col] = encoders[col].inverse_transform(df_resampled[col].astype(int))
-    
-# -----------------------------
-# 8. Save balanced dataset
-# -----------------------------
-output_path = r"D:\projects\Machine_failure_ai4i2020_dataset\Dataset\ai4i2020_smote.csv"
-df_resampled.to_csv(output_path, index=False)
-
-print(f"Balanced dataset saved as: {output_path}")
-print("Original shape:", df.shape)
+df_resampled = pd.read_csv(args.output)
 print("After SMOTE:", df_resampled.shape)
 print(df_resampled['Machine_failure'].value_counts())
 print(df_resampled['Machine_failure'].value_counts(normalize=True))
@@ -0,0 +1,267 @@
+"""Shared, lazily loaded model and encoder artifacts for both APIs.
+
+Nothing is read until first use. NumPy-heavy parts (encoder classes, the
+Product ID lookup table, flat model arrays) are served from .npy files under
+artifacts/cache/ opened with mmap_mode="r", and categorical codes are looked
+up directly in those arrays, so forked uvicorn workers share the pages
+instead of each holding a private copy. The cache is rebuilt whenever its
+source artifact is newer; build it ahead of time with:
+
+    python -m serving.artifacts
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+from functools import partial
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARTIFACTS_DIR = os.path.join(BASE_DIR, "artifacts")
+
+ENGINES = ("lightgbm", "flat")
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def flat_model_sha256(path: str) -> str | None:
+    """SHA-256 of the lightgbm_model.joblib a flat export was made from (None for
+    exports from before it was recorded)"""
+    with np.load(path) as npz:
+        return str(npz["model_sha256"]) if "model_sha256" in npz.files else None
+
+
+class _lazy:
+    """Load on first access, once per store, and record how long it took"""
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.name = loader.__name__
+        self.__doc__ = loader.__doc__
+
+    def __get__(self, store, owner=None):
+        if store is None:
+            return self
+        with store._lock:
+            if self.name not in store.__dict__:
+                start = time.perf_counter()
+                value = self.loader(store)
+                elapsed = time.perf_counter() - start
+                store.load_times[self.name] = elapsed
+                logger.info("Loaded %s in %.1f ms", self.name, elapsed * 1000)
+                # Stored in the instance dict, which shadows this descriptor from now on
+                store.__dict__[self.name] = value
+        return store.__dict__[self.name]
+
+
+class ArtifactStore:
+    """Model, encoders and lookup tables from one artifacts directory"""
+
+    def __init__(self, artifacts_dir: str = ARTIFACTS_DIR, engine: str | None = None, version: str | None = None):
+        # "lightgbm" calls the booster; "flat" evaluates the NumPy node arrays
+        # written by export_flat_model.py and never imports lightgbm
+        engine = engine or os.environ.get("INFERENCE_ENGINE", "lightgbm")
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown INFERENCE_ENGINE {engine!r}, expected one of {ENGINES}")
+        self.engine = engine
+        self.artifacts_dir = artifacts_dir
+        # Registry version (serving/registry.py), or "local" for a plain artifacts directory
+        self.version = version or "local"
+        self.cache_dir = os.path.join(artifacts_dir, "cache")
+        self.load_times = {}
+        self._lock = threading.RLock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.artifacts_dir, name)
+
+    # -------------------------------------------------
+    # mmap-friendly cache
+    # -------------------------------------------------
+    def _cached_npy(self, source: str, name: str, build) -> np.ndarray:
+        """Memory-map cache/<name>.npy, rebuilding it from `source` when missing or stale"""
+        cached = os.path.join(self.cache_dir, f"{name}.npy")
+        if not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(source):
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            # Write then rename, so concurrently starting workers never see a partial file
+            tmp = f"{cached}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, build())
+            os.replace(tmp, cached)
+        return np.load(cached, mmap_mode="r")
+
+    def _encoder_classes(self, name: str) -> np.ndarray:
+        source = self.path(f"{name}.joblib")
+
+        def build():
+            import joblib
+            # Fixed-width unicode instead of object dtype, so the array can be mmapped
+            return joblib.load(source).classes_.astype(str)
+
+        return self._cached_npy(source, f"{name}.classes", build)
+
+    # -------------------------------------------------
+    # Artifacts
+    # -------------------------------------------------
+    @_lazy
+    def model(self):
+        """LGBMClassifier from lightgbm_training.py"""
+        import joblib
+        return joblib.load(self.path("lightgbm_model.joblib"))
+
+    @_lazy
+    def booster(self):
+        return self.model.booster_
+
+    @_lazy
+    def flat_model(self):
+        """FlatTreeModel over memory-mapped node arrays, checked against the
+        lightgbm_model.joblib next to them when there is one"""
+        from serving.flat_model import FlatTreeModel
+
+        source = self.path("lightgbm_flat.npz")
+        model_sha256 = flat_model_sha256(source)
+        model_path = self.path("lightgbm_model.joblib")
+        if os.path.exists(model_path) and model_sha256 != file_sha256(model_path):
+            raise ValueError(f"{source} was not exported from {model_path}; re-run export_flat_model.py")
+        with np.load(source) as npz:
+            names = list(npz.files)
+        arrays = {}
+        for name in names:
+            def build(name=name):
+                with np.load(source) as npz:
+                    return npz[name]
+            # Keyed on the model too, so arrays cached from an older export are never reused
+            cached = os.path.join("lightgbm_flat", (model_sha256 or "unknown")[:16], name)
+            arrays[name] = self._cached_npy(source, cached, build)
+        return FlatTreeModel(arrays)
+
+    @_lazy
+    def product_vocabulary(self):
+        """ProductVocabulary over memory-mapped lookup arrays, built from
+        product_vocabulary.npz; artifacts from before it existed get one with
+        the same codes as their product_id_encoder.joblib"""
+        from serving.vocabulary import ProductVocabulary
+
+        if os.path.exists(self.path("product_vocabulary.npz")):
+            source = self.path("product_vocabulary.npz")
+            load = partial(ProductVocabulary.load, source)
+        else:
+            source = self.path("product_id_encoder.joblib")
+            load = partial(ProductVocabulary.from_labels, self._encoder_classes("product_id_encoder"))
+        arrays = {}
+
+        def build(name):
+            if not arrays:
+                arrays.update(load().arrays())
+            return arrays[name]
+
+        return ProductVocabulary.from_arrays({
+            name: self._cached_npy(source, os.path.join("product_vocabulary", name), partial(build, name))
+            for name in ("keys", "rows", "flat", "digits")
+        })
+
+    @_lazy
+    def product_encoder(self):
+        """Legacy sklearn LabelEncoder, superseded by product_vocabulary"""
+        import joblib
+        return joblib.load(self.path("product_id_encoder.joblib"))
+
+    @_lazy
+    def type_encoder(self):
+        import joblib
+        return joblib.load(self.path("type_encoder.joblib"))
+
+    @_lazy
+    def product_classes(self):
+        """Product IDs in code order"""
+        return self.product_vocabulary.labels()
+
+    @_lazy
+    def type_classes(self):
+        return self._encoder_classes("type_encoder")
+
+    @_lazy
+    def type_vocabulary(self):
+        """Binary search in the memory-mapped, sorted type_encoder classes"""
+        from serving.vocabulary import SortedVocabulary
+        return SortedVocabulary(self.type_classes)
+
+    # -------------------------------------------------
+    # Features
+    # -------------------------------------------------
+    @_lazy
+    def feature_names(self):
+        """The model's input columns, in order"""
+        from serving.features import FEATURES
+
+        if self.engine == "flat":
+            return self.flat_model.feature_names or FEATURES
+        return self.booster.feature_name()
+
+    @_lazy
+    def pipeline(self):
+        """FeaturePipeline from request/CSV columns to this model's feature matrix"""
+        from serving.features import FeaturePipeline
+
+        return FeaturePipeline(
+            {"Product_ID": self.product_vocabulary.encode, "Type": self.type_vocabulary.encode},
+            features=self.feature_names,
+            codes={"Product_ID": self.product_vocabulary, "Type": self.type_vocabulary},
+        )
+
+    # -------------------------------------------------
+    # Scoring
+    # -------------------------------------------------
+    @_lazy
+    def predict_proba(self):
+        """Engine-specific callable: float64 matrix from `pipeline` -> failure probability"""
+        if self.engine == "flat":
+            return self.flat_model.predict_proba
+        return self.booster.predict
+
+    @_lazy
+    def explain(self):
+        """Callable: float64 matrix from `pipeline` -> (n, features + 1) TreeSHAP
+        contributions to the raw score, the last column being the expected value"""
+        from serving.flat_model import flatten_booster
+        from serving.tree_shap import TreeExplainer
+
+        if self.engine == "flat" and "leaf_count" in self.flat_model.arrays:
+            arrays = self.flat_model.arrays
+        else:
+            # Flat exports from before node counts were saved fall back to the booster
+            arrays = flatten_booster(self.booster.dump_model())
+        try:
+            return TreeExplainer(arrays).shap_values
+        except ValueError as e:
+            logger.warning("Vectorized TreeSHAP unavailable (%s), using LightGBM's pred_contrib", e)
+            return partial(self.booster.predict, pred_contrib=True)
+
+    @_lazy
+    def threshold(self):
+        """Decision threshold saved with the model (0.5 matches LGBMClassifier.predict for older artifacts)"""
+        if self.engine == "flat":
+            return self.flat_model.decision_threshold
+        return float(getattr(self.model, "decision_threshold_", 0.5))
+
+    def load_all(self):
+        """Eagerly load everything the configured engine needs for scoring"""
+        for name in ("pipeline", "predict_proba", "threshold"):
+            getattr(self, name)
+        return self
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    for engine in ENGINES:
+        ArtifactStore(engine=engine).load_all()
+    print("✅ Artifact cache ready in", os.path.join(ARTIFACTS_DIR, "cache"))
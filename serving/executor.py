@@ -0,0 +1,97 @@
+import asyncio
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from fastapi.responses import JSONResponse
+from serving.metrics import record_stage
+
+
+class Overloaded(Exception):
+    """Raised when the inference admission queue is full"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full, retry later")
+        self.retry_after = retry_after
+
+
+def overloaded_response(request, exc: Overloaded) -> JSONResponse:
+    """Exception handler: fast 503 with a Retry-After hint"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class InferencePool:
+    """Dedicated, bounded thread pool for model evaluation.
+
+    At most `max_pending` requests are admitted (running or queued); beyond
+    that `Overloaded` is raised immediately instead of letting latency pile
+    up. Inference never runs on Starlette's shared threadpool, so cheap
+    endpoints such as the health check are not stuck behind large batches.
+    """
+
+    def __init__(self, max_workers: int, max_pending: int, retry_after: int = 1):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="inference")
+        # Only touched from the event loop thread, so no lock is needed
+        self.in_flight = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_env(cls) -> "InferencePool":
+        return cls(
+            max_workers=int(os.environ.get("INFERENCE_WORKERS", min(4, os.cpu_count() or 1))),
+            max_pending=int(os.environ.get("INFERENCE_MAX_PENDING", 256)),
+            retry_after=int(os.environ.get("INFERENCE_RETRY_AFTER", 1)),
+        )
+
+    def check(self):
+        """Raise Overloaded if no request could be admitted right now"""
+        if self.in_flight >= self.max_pending:
+            self.rejected += 1
+            raise Overloaded(self.retry_after)
+
+    @contextmanager
+    def admit(self):
+        self.check()
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    async def execute(self, fn, *args):
+        """Run on the inference threads; the caller must already be admitted"""
+        # In a copy of the caller's context, so stage marks (serving/metrics.py)
+        # made on the inference thread are recorded on the calling request
+        context = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, context.run, _dequeued, time.perf_counter(), fn, *args
+        )
+
+    async def run(self, fn, *args):
+        with self.admit():
+            return await self.execute(fn, *args)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _dequeued(submitted: float, fn, *args):
+    # Time spent waiting for a free inference thread
+    record_stage("queue", time.perf_counter() - submitted)
+    return fn(*args)
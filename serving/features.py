@@ -0,0 +1,180 @@
+"""Feature pipeline shared by training and every serving path.
+
+One place defines how input columns become the model's feature matrix:
+column names (raw CSV headers, request fields or feature names), categorical
+encoding and derived features. A FeaturePipeline is compiled once for a
+feature list (normally the model's own feature names) and then fills a
+float64 matrix column by column with NumPy, so a batch never goes through
+per-row Python.
+"""
+from operator import attrgetter, itemgetter
+import numpy as np
+
+TARGET = "Machine_failure"
+
+# Model features of lightgbm_training.py, in training order
+FEATURES = [
+    "Product_ID",
+    "Type",
+    "Air_temperature",
+    "Process_temperature",
+    "Rotational_speed",
+    "Torque",
+    "Tool_wear",
+]
+CATEGORICAL = ["Product_ID", "Type"]
+
+# Original AI4I 2020 CSV headers -> feature names
+RAW_COLUMNS = {
+    "Product ID": "Product_ID",
+    "Air temperature [K]": "Air_temperature",
+    "Process temperature [K]": "Process_temperature",
+    "Rotational speed [rpm]": "Rotational_speed",
+    "Torque [Nm]": "Torque",
+    "Tool wear [min]": "Tool_wear",
+    "Machine failure": TARGET,
+}
+
+# Request field names (InputSchema, PredictionRequest, Dataset/mfp_testing.csv) -> feature names
+INPUT_COLUMNS = {
+    "product_id": "Product_ID",
+    "type": "Type",
+    "air_temperature": "Air_temperature",
+    "process_temperature": "Process_temperature",
+    "rotational_speed": "Rotational_speed",
+    "torque": "Torque",
+    "tool_wear": "Tool_wear",
+}
+FIELDS = {feature: field for field, feature in INPUT_COLUMNS.items()}
+# Request fields passed to the model as numbers
+NUMERIC_INPUTS = [field for field, feature in INPUT_COLUMNS.items() if feature not in CATEGORICAL]
+
+# Derived feature -> (input features, function of those columns). The functions
+# only use arithmetic, so they work on whole arrays and on single floats alike.
+DERIVED = {
+    # Process minus ambient temperature [K]
+    "Temperature_delta": (("Air_temperature", "Process_temperature"), lambda air, process: process - air),
+    # Torque [Nm] * speed [rpm] / 9550 = mechanical power [kW]
+    "Mechanical_power": (("Torque", "Rotational_speed"), lambda torque, speed: torque * speed / 9550),
+}
+
+
+def _aliases(feature: str) -> list[str]:
+    """Column names accepted for `feature`, in lookup order"""
+    names = [feature]
+    names += [raw for raw, name in RAW_COLUMNS.items() if name == feature]
+    if feature in FIELDS:
+        names.append(FIELDS[feature])
+    return names
+
+
+class FeaturePipeline:
+    """Compiled input -> feature matrix transform for one feature list.
+
+    `encoders` maps each categorical feature to a vectorized function from
+    labels to integer codes (-1 for unseen labels); `codes` optionally gives
+    label -> code mappings (anything with .get) for the single-record path.
+    """
+
+    def __init__(self, encoders: dict, features=FEATURES, codes: dict | None = None):
+        self.features = list(features)
+        self.encoders = encoders
+        self.codes = codes or {}
+
+        # Compile: one step per output column, and the raw inputs they read
+        self._steps = []
+        inputs = []
+        for j, name in enumerate(self.features):
+            if name in DERIVED:
+                sources, fn = DERIVED[name]
+                self._steps.append((j, "derive", sources, fn))
+                inputs += [source for source in sources if source not in inputs]
+            elif name in CATEGORICAL:
+                if name not in encoders:
+                    raise ValueError(f"No encoder for categorical feature {name!r}")
+                self._steps.append((j, "encode", name, encoders[name]))
+                if name not in inputs:
+                    inputs.append(name)
+            elif name in FIELDS:
+                self._steps.append((j, "copy", name, None))
+                if name not in inputs:
+                    inputs.append(name)
+            else:
+                raise ValueError(f"Unknown feature {name!r}")
+        self.inputs = inputs
+        self.categorical = {name: j for j, kind, name, _ in self._steps if kind == "encode"}
+        self._aliases = {name: _aliases(name) for name in inputs}
+        self._getters = {name: (itemgetter(FIELDS[name]), attrgetter(FIELDS[name])) for name in inputs}
+
+    def resolve(self, columns, skip=()) -> dict:
+        """Input feature name -> column of `columns` (a DataFrame or a mapping
+        keyed by any accepted column name), for every input not in `skip`"""
+        resolved, missing = {}, []
+        for name in self.inputs:
+            if name in skip:
+                continue
+            for alias in self._aliases[name]:
+                if alias in columns:
+                    resolved[name] = columns[alias]
+                    break
+            else:
+                missing.append(FIELDS.get(name, name))
+        if missing:
+            raise ValueError(f"Input is missing columns: {missing}")
+        return resolved
+
+    def transform(self, columns, encoded: dict | None = None, out: np.ndarray | None = None) -> np.ndarray:
+        """float64 matrix with one column per feature.
+
+        `encoded` may supply already encoded categorical columns (e.g. encoded
+        inside Arrow); `out` is an optional preallocated (n, len(features)) buffer.
+        """
+        encoded = encoded or {}
+        columns = self.resolve(columns, skip=encoded)
+        n = len(next(iter({**columns, **encoded}.values()))) if self.inputs else 0
+        X = np.empty((n, len(self.features)), dtype=np.float64) if out is None else out
+
+        numeric = {}
+
+        def column(name):
+            if name not in numeric:
+                numeric[name] = np.asarray(columns[name], dtype=np.float64)
+            return numeric[name]
+
+        for j, kind, name, fn in self._steps:
+            if kind == "copy":
+                X[:, j] = column(name)
+            elif kind == "encode":
+                X[:, j] = encoded[name] if name in encoded else fn(columns[name])
+            else:
+                X[:, j] = fn(*(column(source) for source in name))
+        return X
+
+    def transform_records(self, records: list, out: np.ndarray | None = None) -> np.ndarray:
+        """transform() for a list of request objects or dicts with request field names"""
+        if not records:
+            return np.empty((0, len(self.features)), dtype=np.float64)
+        pick = 0 if isinstance(records[0], dict) else 1
+        columns = {name: list(map(getters[pick], records)) for name, getters in self._getters.items()}
+        return self.transform(columns, out=out)
+
+    def transform_one(self, record, out: np.ndarray | None = None) -> np.ndarray:
+        """(1, len(features)) matrix for one request object or dict, using the
+        scalar `codes` lookups where available"""
+        pick = 0 if isinstance(record, dict) else 1
+        values = {name: getters[pick](record) for name, getters in self._getters.items()}
+        row = np.empty((1, len(self.features)), dtype=np.float64) if out is None else out
+        for j, kind, name, fn in self._steps:
+            if kind == "copy":
+                row[0, j] = values[name]
+            elif kind == "encode":
+                codes = self.codes.get(name)
+                row[0, j] = codes.get(values[name], -1) if codes is not None else fn([values[name]])[0]
+            else:
+                row[0, j] = fn(*(float(values[source]) for source in name))
+        return row
+
+    def unseen(self, X: np.ndarray) -> dict:
+        """Categorical feature -> rows of X whose label was unseen (code -1)"""
+        rows = {name: np.flatnonzero(X[:, j] < 0) for name, j in self.categorical.items()}
+        return {name: r for name, r in rows.items() if len(r)}
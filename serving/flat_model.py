@@ -0,0 +1,177 @@
+import numpy as np
+
+# LightGBM missing-value handling per split
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+_MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+
+# LightGBM's kZeroThreshold
+_ZERO_THRESHOLD = 1e-35
+
+
+def flatten_booster(dump: dict, decision_threshold: float = 0.5) -> dict:
+    """Flatten Booster.dump_model() output into node arrays.
+
+    Internal nodes of all trees share one table. Child and root references
+    are internal node indices, or ~leaf_index (negative) for leaves.
+    """
+    objective = dump["objective"].split()
+    if objective[0] != "binary" or dump["num_tree_per_iteration"] != 1:
+        raise ValueError(f"Only binary LightGBM models can be flattened, got: {dump['objective']}")
+    sigmoid = 1.0
+    for param in objective[1:]:
+        if param.startswith("sigmoid:"):
+            sigmoid = float(param.split(":", 1)[1])
+
+    feature, threshold, left, right = [], [], [], []
+    default_left, missing_type = [], []
+    leaf_value, roots = [], []
+    # Training rows reaching each node, for TreeSHAP's cover fractions
+    internal_count, leaf_count = [], []
+
+    def add(node) -> int:
+        if "split_index" not in node:
+            leaf_value.append(node["leaf_value"])
+            leaf_count.append(node.get("leaf_count", 0))
+            return ~(len(leaf_value) - 1)
+
+        if node["decision_type"] != "<=":
+            raise ValueError("Categorical splits are not supported by the flat evaluator")
+        idx = len(feature)
+        feature.append(node["split_feature"])
+        threshold.append(node["threshold"])
+        default_left.append(node["default_left"])
+        missing_type.append(_MISSING_TYPES[node["missing_type"]])
+        internal_count.append(node.get("internal_count", 0))
+        left.append(0)
+        right.append(0)
+        left[idx] = add(node["left_child"])
+        right[idx] = add(node["right_child"])
+        return idx
+
+    for tree in dump["tree_info"]:
+        roots.append(add(tree["tree_structure"]))
+
+    return {
+        "feature": np.asarray(feature, dtype=np.int32),
+        "threshold": np.asarray(threshold, dtype=np.float64),
+        "left": np.asarray(left, dtype=np.int32),
+        "right": np.asarray(right, dtype=np.int32),
+        "default_left": np.asarray(default_left, dtype=bool),
+        "missing_type": np.asarray(missing_type, dtype=np.int8),
+        "leaf_value": np.asarray(leaf_value, dtype=np.float64),
+        "internal_count": np.asarray(internal_count, dtype=np.float64),
+        "leaf_count": np.asarray(leaf_count, dtype=np.float64),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "num_features": np.int32(dump["max_feature_idx"] + 1),
+        "feature_names": np.asarray(dump["feature_names"], dtype=str),
+        "sigmoid": np.float64(sigmoid),
+        "decision_threshold": np.float64(decision_threshold),
+    }
+
+
+class FlatTreeModel:
+    """Vectorized evaluator for a flattened LightGBM binary classifier."""
+
+    def __init__(self, arrays, chunk_size: int = 4096):
+        self.arrays = arrays
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.default_left = arrays["default_left"]
+        self.missing_type = arrays["missing_type"]
+        self.leaf_value = arrays["leaf_value"]
+        self.roots = arrays["roots"]
+        self.num_features = int(arrays["num_features"])
+        # Exports from before feature names were saved have none
+        self.feature_names = [str(name) for name in arrays["feature_names"]] if "feature_names" in arrays else None
+        self.sigmoid = float(arrays["sigmoid"])
+        self.decision_threshold = float(arrays["decision_threshold"])
+        self.chunk_size = chunk_size
+
+        # Evaluation tables: leaf j becomes pseudo-node n_internal + j whose
+        # children point back to itself, so finished cursors can keep stepping
+        # in place until the next compaction. children[2 * node + go_left]
+        # replaces a where() over two gathers.
+        n_internal, n_leaves = len(self.feature), len(self.leaf_value)
+        self._n_internal = n_internal
+        sinks = np.arange(n_internal, n_internal + n_leaves, dtype=np.int32)
+        self._feature = np.concatenate([self.feature, np.zeros(n_leaves, dtype=np.int32)])
+        self._threshold = np.concatenate([self.threshold, np.zeros(n_leaves)])
+        self._default_left = np.concatenate([self.default_left, np.zeros(n_leaves, dtype=bool)])
+        self._missing_type = np.concatenate([self.missing_type, np.zeros(n_leaves, dtype=np.int8)])
+        self._roots = self._to_node(self.roots)
+        self._children = np.stack([
+            np.concatenate([self._to_node(self.right), sinks]),
+            np.concatenate([self._to_node(self.left), sinks]),
+        ], axis=1).ravel()
+        # Without Zero/NaN splits, NaN behaves as 0.0 everywhere and can be replaced up front
+        self._plain_splits = not self.missing_type.any()
+
+    def _to_node(self, ref: np.ndarray) -> np.ndarray:
+        return np.where(ref < 0, self._n_internal + ~ref, ref).astype(np.int32)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "FlatTreeModel":
+        with np.load(path) as arrays:
+            return cls({k: arrays[k] for k in arrays.files}, **kwargs)
+
+    def raw_score(self, X: np.ndarray) -> np.ndarray:
+        X = np.ascontiguousarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.num_features:
+            raise ValueError(f"Expected a 2D array with {self.num_features} features, got shape {X.shape}")
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), self.chunk_size):
+            out[start:start + self.chunk_size] = self._raw_chunk(X[start:start + self.chunk_size])
+        return out
+
+    def _raw_chunk(self, X: np.ndarray) -> np.ndarray:
+        n_rows, n_trees = len(X), len(self._roots)
+        if self._plain_splits:
+            X = np.where(np.isnan(X), 0.0, X)
+        flat_x = X.ravel()
+
+        # One cursor per (row, tree) pair, advanced one level per iteration.
+        # Once a quarter of the active cursors sit on leaves they are written
+        # out and dropped, which keeps the per-level work proportional to the
+        # cursors still descending.
+        node = np.tile(self._roots, n_rows)
+        slot = np.arange(len(node), dtype=np.int32)
+        nd = node
+        offset = (slot // n_trees) * np.int32(self.num_features)
+
+        while slot.size:
+            x = flat_x[offset + self._feature[nd]]
+            if self._plain_splits:
+                go_left = x <= self._threshold[nd]
+            else:
+                go_left = self._decide(x, nd)
+            nd = self._children[2 * nd + go_left]
+
+            done = nd >= self._n_internal
+            n_done = np.count_nonzero(done)
+            if n_done == nd.size:
+                node[slot] = nd
+                break
+            if 4 * n_done >= nd.size:
+                node[slot[done]] = nd[done]
+                keep = np.flatnonzero(~done)
+                slot, nd, offset = slot[keep], nd[keep], offset[keep]
+
+        return self.leaf_value[node - self._n_internal].reshape(n_rows, n_trees).sum(axis=1)
+
+    def _decide(self, x: np.ndarray, nd: np.ndarray) -> np.ndarray:
+        # Mirrors LightGBM's NumericalDecision
+        mt = self._missing_type[nd]
+        nan = np.isnan(x)
+        x = np.where(nan & (mt != MISSING_NAN), 0.0, x)
+        missing = ((mt == MISSING_ZERO) & (np.abs(x) <= _ZERO_THRESHOLD)) | ((mt == MISSING_NAN) & nan)
+        return np.where(missing, self._default_left[nd], x <= self._threshold[nd])
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Probability of the positive class, like Booster.predict for a binary model"""
+        return 1.0 / (1.0 + np.exp(-self.sigmoid * self.raw_score(X)))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return (self.predict_proba(X) > self.decision_threshold).astype(int)
+
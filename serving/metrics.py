@@ -0,0 +1,236 @@
+"""Request metrics for the inference APIs, exposed in Prometheus text format.
+
+A pure-ASGI middleware times every request and gives it a RequestTimer in a
+context variable. Code on the hot path calls mark("stage") after each step,
+which records the time since the previous mark; outside an instrumented
+request mark() is a no-op. InferencePool runs jobs in a copy of the caller's
+context, so marks made on the inference threads land on the right request.
+Response serialization is whatever is left between the endpoint's last mark
+and the start of the response.
+
+Everything is plain Python (a bisect and a lock per observation) so there is
+no client library to install:
+
+    GET /metrics    -> http_request_duration_seconds, inference_stage_duration_seconds,
+                       inference_batch_rows, ... with app/route/model_version labels
+"""
+import bisect
+import contextvars
+import threading
+import time
+
+# Upper bounds in seconds, 0.25 ms .. 10 s
+LATENCY_BUCKETS = (0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Rows per model call
+ROW_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram per label combination"""
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                bucket_labels = _format_labels(self.labelnames + ("le",), labels + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Values read from `collect()` at scrape time: an iterable of (labels, value)"""
+
+    def __init__(self, name: str, help: str, labelnames, collect, kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+        self.kind = kind
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, value in self.collect():
+            if value is not None:
+                lines.append(f"{self.name}{_format_labels(self.labelnames, tuple(labels))} {_format_value(value)}")
+        return lines
+
+
+class RequestTimer:
+    """Stage durations of one request; mark(stage) records the time since the previous mark"""
+
+    __slots__ = ("start", "last", "stages", "rows")
+
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.stages = []
+        self.rows = None
+
+    def mark(self, stage: str):
+        now = time.perf_counter()
+        self.stages.append((stage, now - self.last))
+        self.last = now
+
+    def add(self, stage: str, seconds: float):
+        """Record a stage measured elsewhere; the next mark() starts from now"""
+        self.stages.append((stage, seconds))
+        self.last = time.perf_counter()
+
+
+_timer = contextvars.ContextVar("request_timer", default=None)
+
+
+def mark(stage: str):
+    """End `stage` of the current request (no-op outside an instrumented request)"""
+    timer = _timer.get()
+    if timer is not None:
+        timer.mark(stage)
+
+
+def record_stage(stage: str, seconds: float):
+    """Record a separately measured stage of the current request"""
+    timer = _timer.get()
+    if timer is not None:
+        timer.add(stage, seconds)
+
+
+def record_rows(rows: int):
+    """Number of rows the current request sent to the model"""
+    timer = _timer.get()
+    if timer is not None:
+        timer.rows = rows
+
+
+class ServingMetrics:
+    """Metric families of one API; `version()` returns the model version being served"""
+
+    def __init__(self, app: str, version, profiler=None):
+        self.app = app
+        self.version = version
+        self.profiler = profiler
+        self.requests = Histogram(
+            "http_request_duration_seconds", "Request latency, from the first byte received to the last sent",
+            ("app", "route", "method", "status", "model_version"),
+        )
+        self.stages = Histogram(
+            "inference_stage_duration_seconds", "Time per request stage (validate, queue, encode, predict, serialize, ...)",
+            ("app", "route", "stage", "model_version"),
+        )
+        self.rows = Histogram(
+            "inference_batch_rows", "Rows per request, or per model call for micro-batches",
+            ("app", "route", "model_version"), buckets=ROW_BUCKETS,
+        )
+        self.families = [
+            self.requests, self.stages, self.rows,
+            Gauge("model_info", "Model version currently served", ("app", "model_version"),
+                  lambda: [((self.app, self.version()), 1)]),
+        ]
+
+    def gauge(self, name: str, help: str, collect, labelnames=(), kind: str = "gauge"):
+        """Add a family read at scrape time; `app` is prepended to `labelnames`"""
+        self.families.append(Gauge(
+            name, help, ("app",) + tuple(labelnames),
+            lambda: [((self.app,) + tuple(labels), value) for labels, value in collect()], kind,
+        ))
+
+    def observe_rows(self, route: str, rows: int):
+        self.rows.observe(rows, self.app, route, self.version())
+
+    def observe_request(self, route: str, method: str, status: int, timer: RequestTimer, end: float):
+        version = self.version()
+        self.requests.observe(end - timer.start, self.app, route, method, str(status), version)
+        # A stage can repeat (e.g. queue per streamed chunk); each is observed as the request's total
+        totals = {}
+        for stage, seconds in timer.stages:
+            totals[stage] = totals.get(stage, 0.0) + seconds
+        for stage, seconds in totals.items():
+            self.stages.observe(seconds, self.app, route, stage, version)
+        if timer.rows is not None:
+            self.rows.observe(timer.rows, self.app, route, version)
+
+    def render(self) -> str:
+        lines = []
+        for family in self.families:
+            lines += family.render()
+        return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """Times every HTTP request and hands it a RequestTimer (pure ASGI, so
+    streaming responses are timed to their last chunk)"""
+
+    def __init__(self, app, metrics: ServingMetrics):
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        timer = RequestTimer()
+        token = _timer.set(timer)
+        status = 500
+
+        async def send_timed(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Only endpoints that mark their stages get a serialize stage
+                if timer.stages:
+                    timer.mark("serialize")
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_timed)
+        finally:
+            _timer.reset(token)
+            end = time.perf_counter()
+            route = scope.get("route")
+            # Route templates keep the label set bounded; unknown paths share one label
+            route = getattr(route, "path", None) or "unmatched"
+            self.metrics.observe_request(route, scope["method"], status, timer, end)
+            if self.metrics.profiler is not None:
+                self.metrics.profiler.request_finished(route, timer.start, end)
@@ -0,0 +1,382 @@
+"""Append-only log of every scored reading, written off the request path.
+
+Scoring code calls log_predictions(inputs, results, version) once per model
+call. Inside a request served under PredictionLogMiddleware (or a
+PredictionLog.bound() block) that queues the batch as-is and returns; anywhere
+else it is a no-op, so offline scoring is never logged. A daemon writer
+thread drains the queue every `flush_ms` (sooner when it fills up), formats
+the batches as JSON Lines
+
+    {"ts": 1760781600.12, "route": "/predict", "model_version": "v3", "product_id": "M14860",
+     "type": "M", "air_temperature": 298.1, ..., "prediction": 0, "probability": 0.0123}
+
+and appends them to <out_dir>/predictions-<timestamp>-<pid>-<n>.jsonl. A file
+is rotated once it reaches `max_bytes` or is `rotate_seconds` old, and closed
+files are gzipped (.jsonl.gz). With format="parquet" (PREDICTION_LOG_FORMAT)
+each flush is a zstd-compressed row group instead, about a third of the
+writer's CPU time per row; such files become readable when they are rotated.
+
+At most `max_pending` rows wait for the writer. When the disk falls behind,
+further batches are dropped and counted (on_full="drop"), or the scoring
+thread first waits up to `block_ms` for room (on_full="block"). Scoring runs
+on the inference pool, so blocking holds pool slots and surfaces as 503
+Overloaded instead of stalling the event loop.
+
+read_log() loads log files back into a DataFrame with the request field
+names, which api_2/bulk_score.py and benchmarks/load_test.py replay.
+"""
+import contextvars
+import glob
+import gzip
+import logging
+import os
+import shutil
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+import numpy as np
+import pandas as pd
+from serving.features import INPUT_COLUMNS
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Request fields, in log column order
+LOG_FIELDS = list(INPUT_COLUMNS)
+LOG_COLUMNS = ["ts", "route", "model_version"] + LOG_FIELDS + ["prediction", "probability"]
+
+logger = logging.getLogger(__name__)
+
+
+def _snapshot(inputs):
+    """Inputs as they are at enqueue time; formatting happens on the writer thread"""
+    if isinstance(inputs, pd.DataFrame):
+        # Callers may add columns afterwards, so keep only the field arrays
+        return {name: inputs[name].to_numpy() for name in LOG_FIELDS}
+    # Lists of records, dicts of arrays and (immutable) Arrow tables are kept as they are
+    return inputs
+
+
+def _columns(inputs) -> dict:
+    if isinstance(inputs, dict):
+        return {name: inputs[name] for name in LOG_FIELDS}
+    if hasattr(inputs, "to_pandas"):
+        # pyarrow.Table
+        return {name: inputs.column(name).to_numpy() for name in LOG_FIELDS}
+    # InputSchema / PredictionRequest objects, or dicts
+    if inputs and isinstance(inputs[0], dict):
+        return {name: [record[name] for record in inputs] for name in LOG_FIELDS}
+    return {name: [getattr(record, name) for record in inputs] for name in LOG_FIELDS}
+
+
+def _arrow_schema():
+    import pyarrow as pa
+    strings = {"route", "model_version", "product_id", "type"}
+    return pa.schema([
+        (name, pa.string() if name in strings else pa.int64() if name == "prediction" else pa.float64())
+        for name in LOG_COLUMNS
+    ])
+
+
+def _results(results):
+    """(predictions, probabilities) arrays from either form log_predictions accepts"""
+    if isinstance(results, tuple):
+        return results
+    pairs = np.asarray(results, dtype=np.float64).reshape(-1, 2)
+    return pairs[:, 0].astype(np.int64), pairs[:, 1]
+
+
+class PredictionLog:
+    """Bounded queue of scored batches and the thread that writes them to rotating JSONL files"""
+
+    def __init__(self, out_dir: str, format: str = "jsonl", max_bytes: int = 64 * 1024 ** 2,
+                 rotate_seconds: float = 3600.0, compress: bool = True, max_pending: int = 100_000,
+                 on_full: str = "drop", block_ms: float = 50.0, flush_ms: float = 500.0):
+        if format not in ("jsonl", "parquet"):
+            raise ValueError(f"format must be 'jsonl' or 'parquet', got {format!r}")
+        if on_full not in ("drop", "block"):
+            raise ValueError(f"on_full must be 'drop' or 'block', got {on_full!r}")
+        self.out_dir = out_dir
+        self.format = format
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.max_pending = max_pending
+        self.on_full = on_full
+        self.block_ms = block_ms
+        self.flush_ms = flush_ms
+        # (time, route, model version, inputs, results, rows) per scored batch
+        self._queue = deque()
+        self._pending = 0
+        self._cond = threading.Condition()
+        self._thread = None
+        self._closing = False
+        # Current output file
+        self._file = None
+        self._path = None
+        self._opened_at = 0.0
+        self._sequence = 0
+        self.enqueued_rows = 0
+        self.written_rows = 0
+        self.dropped_rows = 0
+        self.dropped_batches = 0
+        self.blocked_seconds = 0.0
+        self.write_errors = 0
+        self.rotations = 0
+
+    @classmethod
+    def from_env(cls) -> "PredictionLog":
+        log = cls(
+            out_dir=os.environ.get("PREDICTION_LOG_DIR", os.path.join(BASE_DIR, "prediction_logs")),
+            format=os.environ.get("PREDICTION_LOG_FORMAT", "jsonl"),
+            max_bytes=int(float(os.environ.get("PREDICTION_LOG_MAX_MB", 64)) * 1024 ** 2),
+            rotate_seconds=float(os.environ.get("PREDICTION_LOG_ROTATE_SECONDS", 3600)),
+            compress=os.environ.get("PREDICTION_LOG_COMPRESS", "1") not in ("", "0", "false"),
+            max_pending=int(os.environ.get("PREDICTION_LOG_MAX_PENDING", 100_000)),
+            on_full=os.environ.get("PREDICTION_LOG_ON_FULL", "drop"),
+            block_ms=float(os.environ.get("PREDICTION_LOG_BLOCK_MS", 50.0)),
+            flush_ms=float(os.environ.get("PREDICTION_LOG_FLUSH_MS", 500.0)),
+        )
+        if os.environ.get("PREDICTION_LOG_ENABLED", "1") not in ("", "0", "false"):
+            log.start()
+        return log
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def pending_rows(self) -> int:
+        return self._pending
+
+    def start(self):
+        with self._cond:
+            if self._thread is None:
+                self._closing = False
+                self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Write out everything queued, close (and compress) the current file"""
+        with self._cond:
+            thread, self._thread = self._thread, None
+            self._closing = True
+            self._cond.notify_all()
+        if thread is not None:
+            thread.join()
+
+    @contextmanager
+    def bound(self, route: str):
+        """Log the predictions made in this block (and in pool jobs it submits) under `route`"""
+        token = _target.set((self, route) if self._thread is not None else None)
+        try:
+            yield
+        finally:
+            _target.reset(token)
+
+    def write(self, route: str, version, inputs, results) -> bool:
+        """Queue one scored batch; False if it was dropped"""
+        rows = len(results[0]) if isinstance(results, tuple) else len(results)
+        if not rows:
+            return True
+        entry = (time.time(), route, version, _snapshot(inputs), results, rows)
+        with self._cond:
+            if self._thread is None:
+                return False
+            if self._pending and self._pending + rows > self.max_pending and self.on_full == "block":
+                start = time.perf_counter()
+                self._cond.wait_for(lambda: self._pending + rows <= self.max_pending or self._closing,
+                                    timeout=self.block_ms / 1000)
+                self.blocked_seconds += time.perf_counter() - start
+            # A batch larger than max_pending still goes into an empty queue
+            if self._pending and self._pending + rows > self.max_pending:
+                self.dropped_rows += rows
+                self.dropped_batches += 1
+                return False
+            self._queue.append(entry)
+            self._pending += rows
+            self.enqueued_rows += rows
+            if self._pending * 2 >= self.max_pending:
+                # Half full: wake the writer early
+                self._cond.notify_all()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "out_dir": self.out_dir,
+            "format": self.format,
+            "file": self._path,
+            "on_full": self.on_full,
+            "pending_rows": self.pending_rows,
+            "max_pending": self.max_pending,
+            "enqueued_rows": self.enqueued_rows,
+            "written_rows": self.written_rows,
+            "dropped_rows": self.dropped_rows,
+            "dropped_batches": self.dropped_batches,
+            "blocked_seconds": round(self.blocked_seconds, 3),
+            "write_errors": self.write_errors,
+            "rotations": self.rotations,
+        }
+
+    # -------------------------------------------------
+    # Writer thread
+    # -------------------------------------------------
+    def _gather(self, batch) -> dict:
+        """One array per log column for a whole flush (per-batch frames would
+        cost more than formatting the rows for single-record requests)"""
+        parts = {name: [] for name in LOG_COLUMNS}
+        for ts, route, version, inputs, results, rows in batch:
+            preds, probs = _results(results)
+            parts["ts"].append(np.full(rows, round(ts, 3)))
+            parts["route"].append(np.full(rows, route, dtype=object))
+            parts["model_version"].append(np.full(rows, version, dtype=object))
+            for name, values in _columns(inputs).items():
+                parts[name].append(np.asarray(values))
+            parts["prediction"].append(np.asarray(preds, dtype=np.int64))
+            parts["probability"].append(np.asarray(probs, dtype=np.float64))
+        return {name: np.concatenate(values) for name, values in parts.items()}
+
+    def _open(self):
+        os.makedirs(self.out_dir, exist_ok=True)
+        self._sequence += 1
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self._path = os.path.join(self.out_dir, f"predictions-{stamp}-{os.getpid()}-{self._sequence:04d}.{self.format}")
+        if self.format == "parquet":
+            import pyarrow.parquet as pq
+            # Unreadable until the footer is written on close, so it is renamed then
+            self._file = pq.ParquetWriter(self._path + ".partial", _arrow_schema(), compression="zstd")
+        else:
+            self._file = open(self._path, "ab")
+        self._opened_at = time.monotonic()
+
+    def _size(self) -> int:
+        if self.format == "parquet":
+            return os.path.getsize(self._path + ".partial")
+        return self._file.tell()
+
+    def _rotate(self):
+        file, path = self._file, self._path
+        self._file = self._path = None
+        file.close()
+        self.rotations += 1
+        if self.format == "parquet":
+            os.replace(path + ".partial", path)
+        elif self.compress:
+            with open(path, "rb") as src, gzip.open(path + ".gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+
+    def _write(self, batch):
+        rows = sum(entry[-1] for entry in batch)
+        try:
+            columns = self._gather(batch)
+            if self._file is None:
+                self._open()
+            if self.format == "parquet":
+                import pyarrow as pa
+                # One row group per flush
+                self._file.write_table(pa.Table.from_pydict(columns, schema=_arrow_schema()))
+            else:
+                frame = pd.DataFrame(columns)
+                # pandas escapes "/" (valid JSON, but routes are easier to grep unescaped)
+                text = frame.to_json(orient="records", lines=True, double_precision=10).replace("\\/", "/")
+                self._file.write((text if text.endswith("\n") else text + "\n").encode())
+                self._file.flush()
+            self.written_rows += rows
+            if self._size() >= self.max_bytes:
+                self._rotate()
+        except Exception:
+            logger.exception("Could not write %d rows to the prediction log", rows)
+            self.write_errors += 1
+            self.dropped_rows += rows
+            self.dropped_batches += len(batch)
+            if self._file is not None:
+                # Start a fresh file on the next write
+                try:
+                    self._rotate()
+                except Exception:
+                    self._file = self._path = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._closing or self._pending * 2 >= self.max_pending,
+                                    timeout=self.flush_ms / 1000)
+                batch, self._queue = self._queue, deque()
+                closing = self._closing
+            if batch:
+                self._write(batch)
+                with self._cond:
+                    # Rows only stop counting against max_pending once they are on disk
+                    self._pending -= sum(entry[-1] for entry in batch)
+                    self._cond.notify_all()
+            if self._file is not None and (closing or time.monotonic() - self._opened_at >= self.rotate_seconds):
+                try:
+                    self._rotate()
+                except OSError:
+                    logger.exception("Could not rotate prediction log %s", self._path)
+            if closing:
+                return
+
+
+_target = contextvars.ContextVar("prediction_log", default=None)
+
+
+def log_predictions(inputs, results, version):
+    """Queue one model call's rows for the prediction log, if the current request is logged.
+
+    `inputs`: a list of records (InputSchema objects or dicts), a DataFrame or
+    dict of arrays keyed by request field names, or an Arrow table.
+    `results`: a list of (prediction, probability) pairs, or a tuple of
+    (predictions, probabilities) arrays.
+    """
+    target = _target.get()
+    if target is not None:
+        log, route = target
+        log.write(route, version, inputs, results)
+
+
+class PredictionLogMiddleware:
+    """Logs predictions made while serving each HTTP request under its path (pure ASGI)"""
+
+    def __init__(self, app, log: PredictionLog):
+        self.app = app
+        self.log = log
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.log.enabled:
+            return await self.app(scope, receive, send)
+        token = _target.set((self.log, scope["path"]))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _target.reset(token)
+
+
+# -------------------------------------------------
+# Replay
+# -------------------------------------------------
+LOG_SUFFIXES = (".jsonl", ".jsonl.gz", ".parquet")
+
+
+def log_files(path: str) -> list[str]:
+    """Log files in a directory, oldest first (Parquet files still being written
+    are skipped), or [path] for a single file"""
+    if os.path.isdir(path):
+        return sorted(file for suffix in LOG_SUFFIXES for file in glob.glob(os.path.join(path, "predictions-*" + suffix)))
+    return [path]
+
+
+def read_log(path: str) -> pd.DataFrame:
+    """Logged rows from a log file (.jsonl, .jsonl.gz or .parquet) or a directory of them"""
+    dtypes = {"route": str, "model_version": str, "product_id": str, "type": str}
+    frames = [
+        pd.read_parquet(file) if file.endswith(".parquet")
+        else pd.read_json(file, lines=True, dtype=dtypes, compression="infer")
+        for file in log_files(path)
+    ]
+    frames = [frame for frame in frames if len(frame)]
+    if not frames:
+        return pd.DataFrame(columns=LOG_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,152 @@
+"""Opt-in sampling profiler that dumps flame-graph data for slow requests.
+
+While enabled, a daemon thread snapshots the Python stack of every thread
+each `interval_ms` into a ring buffer. When a request takes longer than
+`slow_ms` (see MetricsMiddleware), the samples taken while it ran are
+written to
+
+    <out_dir>/<timestamp>_<route>_<ms>ms.folded
+
+as collapsed stacks, "thread;outer;...;inner <count>" per line: the input of
+flamegraph.pl, speedscope and inferno. Samples cover all threads (event
+loop and inference pool alike), so requests running at the same time show up
+in each other's profiles. Disabled, it costs one attribute check per request.
+
+Toggled at runtime through POST /admin/profiler, or on from startup with
+PROFILER_ENABLED=1 (PROFILER_SLOW_MS, PROFILER_INTERVAL_MS, PROFILER_DIR).
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import suppress
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class SamplingProfiler:
+    """Ring buffer of all threads' stacks, written out for requests slower than slow_ms"""
+
+    def __init__(self, out_dir: str, interval_ms: float = 5.0, slow_ms: float = 100.0,
+                 max_samples: int = 20000, max_dumps: int = 50):
+        self.out_dir = out_dir
+        self.interval_ms = interval_ms
+        self.slow_ms = slow_ms
+        # (perf_counter time, folded stack) per thread per tick
+        self._samples = deque(maxlen=max_samples)
+        # Slow requests waiting for the sampler thread to write them out
+        self._slow = deque()
+        self._frame_names = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self.dumps = deque(maxlen=max_dumps)
+        self.slow_requests = 0
+
+    @classmethod
+    def from_env(cls) -> "SamplingProfiler":
+        profiler = cls(
+            out_dir=os.environ.get("PROFILER_DIR", os.path.join(BASE_DIR, "profiles")),
+            interval_ms=float(os.environ.get("PROFILER_INTERVAL_MS", 5.0)),
+            slow_ms=float(os.environ.get("PROFILER_SLOW_MS", 100.0)),
+        )
+        if os.environ.get("PROFILER_ENABLED", "0") not in ("", "0", "false"):
+            profiler.start()
+        return profiler
+
+    @property
+    def enabled(self) -> bool:
+        return self._thread is not None
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+            self._samples.clear()
+
+    def configure(self, enabled: bool | None = None, slow_ms: float | None = None,
+                  interval_ms: float | None = None):
+        if slow_ms is not None:
+            self.slow_ms = slow_ms
+        if interval_ms is not None:
+            self.interval_ms = interval_ms
+        if enabled is True:
+            self.start()
+        elif enabled is False:
+            self.stop()
+
+    def request_finished(self, route: str, start: float, end: float):
+        """Called with perf_counter() times once a request is done"""
+        if self._thread is not None and (end - start) * 1000 >= self.slow_ms:
+            self.slow_requests += 1
+            self._slow.append((route, start, end))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "interval_ms": self.interval_ms,
+            "slow_ms": self.slow_ms,
+            "out_dir": self.out_dir,
+            "buffered_samples": len(self._samples),
+            "slow_requests": self.slow_requests,
+            "dumps": list(self.dumps),
+        }
+
+    # -------------------------------------------------
+    # Sampler thread
+    # -------------------------------------------------
+    def _frame_name(self, code) -> str:
+        name = self._frame_names.get(code)
+        if name is None:
+            name = self._frame_names[code] = (
+                f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+            )
+        return name
+
+    def _sample(self):
+        now = time.perf_counter()
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(self._frame_name(frame.f_code))
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            self._samples.append((now, ";".join(reversed(stack))))
+
+    def _dump(self, route: str, start: float, end: float):
+        counts = Counter(stack for t, stack in list(self._samples) if start <= t <= end)
+        if not counts:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        slug = route.strip("/").replace("/", "_") or "root"
+        path = os.path.join(self.out_dir, f"{stamp}_{slug}_{(end - start) * 1000:.0f}ms.folded")
+        with open(path, "w") as f:
+            for stack, count in counts.most_common():
+                f.write(f"{stack} {count}\n")
+        if len(self.dumps) == self.dumps.maxlen:
+            # Keep at most max_dumps files on disk
+            with suppress(OSError):
+                os.remove(self.dumps[0])
+        self.dumps.append(path)
+
+    def _run(self):
+        while not self._stop.wait(self.interval_ms / 1000):
+            self._sample()
+            # Requests queued before this tick's sample have all their samples in
+            while self._slow:
+                self._dump(*self._slow.popleft())
@@ -0,0 +1,162 @@
+"""Versioned, content-hashed model registry.
+
+Each published version is a directory artifacts/registry/<version>/ holding
+the model and encoder files, where <version> is derived from their SHA-256
+hashes. artifacts/registry/manifest.json lists every version and names the
+current one. Publishing never touches a version that is being served, so
+APIs can load the new one in the background and swap atomically.
+
+    python -m serving.registry publish     # bundle artifacts/ as a new current version
+    python -m serving.registry list
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from serving.artifacts import ARTIFACTS_DIR, ArtifactStore, file_sha256, flat_model_sha256
+
+REGISTRY_DIR = os.path.join(ARTIFACTS_DIR, "registry")
+MANIFEST = "manifest.json"
+
+BUNDLE_FILES = ["lightgbm_model.joblib", "type_encoder.joblib"]
+# Product ID encoding: the vocabulary, or the LabelEncoder of older artifacts
+PRODUCT_FILES = ["product_vocabulary.npz", "product_id_encoder.joblib"]
+# Optional, only bundled when exported from the model being published
+FLAT_MODEL_FILE = "lightgbm_flat.npz"
+
+
+class ModelRegistry:
+    def __init__(self, registry_dir: str = REGISTRY_DIR):
+        self.registry_dir = registry_dir
+        self.manifest_path = os.path.join(registry_dir, MANIFEST)
+
+    def manifest(self) -> dict:
+        if not os.path.exists(self.manifest_path):
+            return {"current": None, "versions": []}
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: dict):
+        tmp = f"{self.manifest_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp, self.manifest_path)
+
+    @staticmethod
+    def _matches(version_dir: str, hashes: dict) -> bool:
+        """Whether `version_dir` holds every file of `hashes` with that content"""
+        return all(
+            os.path.isfile(os.path.join(version_dir, name)) and file_sha256(os.path.join(version_dir, name)) == digest
+            for name, digest in hashes.items()
+        )
+
+    def current_version(self) -> str | None:
+        return self.manifest()["current"]
+
+    def version_dir(self, version: str) -> str:
+        return os.path.join(self.registry_dir, version)
+
+    @staticmethod
+    def valid_name(version: str) -> bool:
+        """Whether `version` is a bare directory name: no separators, no "..", not absolute"""
+        return (bool(version) and ".." not in version and not os.path.isabs(version)
+                and not any(sep in version for sep in {"/", os.sep, os.altsep} - {None}))
+
+    def published(self, version: str) -> bool:
+        """Whether `version` is listed in the manifest and present in the registry"""
+        return (self.valid_name(version)
+                and version in {v["version"] for v in self.manifest()["versions"]}
+                and os.path.isdir(self.version_dir(version)))
+
+    def store(self, version: str | None = None, **kwargs) -> ArtifactStore:
+        """ArtifactStore for `version` (default: current); nothing is loaded yet"""
+        version = version or self.current_version()
+        if version is None:
+            raise ValueError(f"No model versions published in {self.registry_dir}")
+        if not self.published(version):
+            raise ValueError(f"Unknown model version {version!r}")
+        return ArtifactStore(self.version_dir(version), version=version, **kwargs)
+
+    def publish(self, artifacts_dir: str = ARTIFACTS_DIR, make_current: bool = True) -> str:
+        """Copy the artifact bundle into the registry under its content hash"""
+        product_file = next((name for name in PRODUCT_FILES if os.path.exists(os.path.join(artifacts_dir, name))), None)
+        if product_file is None:
+            raise FileNotFoundError(f"No product encoding ({' or '.join(PRODUCT_FILES)}) in {artifacts_dir}")
+        files = [*BUNDLE_FILES, product_file]
+        hashes = {name: file_sha256(os.path.join(artifacts_dir, name)) for name in files}
+        flat_path = os.path.join(artifacts_dir, FLAT_MODEL_FILE)
+        if os.path.exists(flat_path) and flat_model_sha256(flat_path) == hashes[BUNDLE_FILES[0]]:
+            files.append(FLAT_MODEL_FILE)
+            hashes[FLAT_MODEL_FILE] = file_sha256(flat_path)
+        version = hashlib.sha256(
+            "".join(f"{name}:{digest}\n" for name, digest in sorted(hashes.items())).encode()
+        ).hexdigest()[:12]
+
+        target = self.version_dir(version)
+        if not os.path.isdir(target):
+            staging = f"{target}.{os.getpid()}.tmp"
+            try:
+                os.makedirs(staging, exist_ok=True)
+                for name in files:
+                    shutil.copy2(os.path.join(artifacts_dir, name), os.path.join(staging, name))
+                try:
+                    os.replace(staging, target)
+                except OSError:
+                    # A concurrent publish of the same content may have created it first
+                    if not self._matches(target, hashes):
+                        raise
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+
+        manifest = self.manifest()
+        if version not in {v["version"] for v in manifest["versions"]}:
+            manifest["versions"].append({
+                "version": version,
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "files": hashes,
+            })
+        if make_current:
+            manifest["current"] = version
+        os.makedirs(self.registry_dir, exist_ok=True)
+        self._write_manifest(manifest)
+        return version
+
+    def activate(self, version: str):
+        """Point the manifest at an already published version (e.g. a rollback)"""
+        if not self.published(version):
+            raise ValueError(f"Unknown model version {version!r}")
+        manifest = self.manifest()
+        manifest["current"] = version
+        self._write_manifest(manifest)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the versioned model registry")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pub = sub.add_parser("publish", help="Publish the artifacts directory as a new version")
+    pub.add_argument("--artifacts-dir", default=ARTIFACTS_DIR)
+    pub.add_argument("--no-activate", action="store_true", help="Publish without making it current")
+    act = sub.add_parser("activate", help="Make a published version current")
+    act.add_argument("version")
+    sub.add_parser("list", help="List published versions")
+    args = parser.parse_args()
+
+    registry = ModelRegistry()
+    if args.command == "publish":
+        version = registry.publish(args.artifacts_dir, make_current=not args.no_activate)
+        print(f"✅ Published model version {version}")
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"✅ Current model version is now {args.version}")
+    else:
+        manifest = registry.manifest()
+        for entry in manifest["versions"]:
+            marker = "*" if entry["version"] == manifest["current"] else " "
+            print(f"{marker} {entry['version']}  {entry['created']}  {', '.join(entry['files'])}")
+
+
+if __name__ == "__main__":
+    main()
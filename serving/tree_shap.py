@@ -0,0 +1,218 @@
+"""Exact TreeSHAP feature contributions for the flattened LightGBM model, in NumPy.
+
+Output matches Booster.predict(X, pred_contrib=True): one column per feature
+plus a last column holding the expected raw score, and every row sums to the
+row's raw (log-odds) score.
+
+Instead of LightGBM's per-row recursion, each leaf is reduced to a lookup
+table. A leaf's path tests k distinct features (k <= path depth); for a row
+only the k agreement bits o_i ("x_i lies in the leaf's interval on feature i")
+matter, and the leaf adds to feature j
+
+    v * (o_j - z_j) * sum_s s!(k-1-s)!/k! * [t^s] prod_{i != j} (z_i + o_i t)
+
+where v is the leaf value and z_i the product of cover fractions along the
+path at feature i's splits. The 2**k x k values are tabulated once at load,
+so explaining a row is: agreement bits -> pattern index -> table entries,
+summed per feature.
+
+Rows that fall on the same side of every split of a tree (one "cell") get the
+same contributions from it, so large batches are evaluated once per distinct
+cell and scattered back. Cell codes come from a mixed-radix table over each
+feature's global threshold bins, one searchsorted per feature for all trees.
+"""
+from math import factorial
+import numpy as np
+import pandas as pd
+
+
+def _leaf_paths(arrays: dict):
+    """Per tree: internal nodes, and (value, features, z, lo, hi) per leaf with a non-empty path"""
+    feature, threshold = arrays["feature"], arrays["threshold"]
+    left, right = arrays["left"], arrays["right"]
+    internal_count, leaf_count = arrays["internal_count"], arrays["leaf_count"]
+
+    def count(ref):
+        return leaf_count[~ref] if ref < 0 else internal_count[ref]
+
+    trees, expected = [], 0.0
+    for root in arrays["roots"]:
+        root = int(root)
+        total = count(root)
+        nodes, leaves = [], []
+        # (node, [(feature, cover fraction, went left, threshold), ...])
+        stack = [(root, [])]
+        while stack:
+            ref, path = stack.pop()
+            if ref < 0:
+                value = float(arrays["leaf_value"][~ref])
+                expected += value * leaf_count[~ref] / total
+                if path:
+                    z, lo, hi = {}, {}, {}
+                    for f, fraction, went_left, thr in path:
+                        z[f] = z.get(f, 1.0) * fraction
+                        if went_left:
+                            hi[f] = min(hi.get(f, np.inf), thr)
+                        else:
+                            lo[f] = max(lo.get(f, -np.inf), thr)
+                    features = list(z)
+                    leaves.append((value, features, [z[f] for f in features],
+                                   [lo.get(f, -np.inf) for f in features], [hi.get(f, np.inf) for f in features]))
+                continue
+            nodes.append(ref)
+            f, thr, n = int(feature[ref]), float(threshold[ref]), internal_count[ref]
+            stack.append((int(right[ref]), path + [(f, count(int(right[ref])) / n, False, thr)]))
+            stack.append((int(left[ref]), path + [(f, count(int(left[ref])) / n, True, thr)]))
+        trees.append((nodes, leaves))
+    return trees, expected
+
+
+def _leaf_tables(values: np.ndarray, z: np.ndarray) -> np.ndarray:
+    """(n, 2**k, k) contributions for n leaves sharing path length k, indexed by agreement pattern"""
+    n, k = z.shape
+    patterns = np.arange(2 ** k)
+    o = ((patterns[:, None] >> np.arange(k)) & 1).astype(np.float64)  # (2**k, k)
+    weights = np.array([factorial(s) * factorial(k - 1 - s) / factorial(k) for s in range(k)])
+    out = np.empty((n, 2 ** k, k))
+    for j in range(k):
+        # Coefficients of prod_{i != j} (z_i + o_i t), lowest power first
+        poly = np.zeros((n, 2 ** k, k))
+        poly[:, :, 0] = 1.0
+        for i in range(k):
+            if i == j:
+                continue
+            shifted = np.zeros_like(poly)
+            shifted[:, :, 1:] = poly[:, :, :-1]
+            poly = poly * z[:, i, None, None] + shifted * o[None, :, i, None]
+        out[:, :, j] = values[:, None] * (o[None, :, j] - z[:, j, None]) * (poly @ weights)
+    return out
+
+
+class TreeExplainer:
+    """Per-feature contributions for a model flattened by serving.flat_model.flatten_booster.
+
+    `arrays` needs the node cover counts ("internal_count", "leaf_count") that
+    newer exports include. Batches of up to `small_batch` rows skip the cell
+    deduplication, which only pays off once rows repeat within a tree.
+    """
+
+    def __init__(self, arrays, small_batch: int = 16, chunk_size: int = 16384):
+        if "leaf_count" not in arrays or "internal_count" not in arrays:
+            raise ValueError("Flat model arrays have no node counts; re-run export_flat_model.py")
+        if np.asarray(arrays["missing_type"]).any():
+            # The tables assume plain x <= threshold splits
+            raise ValueError("TreeExplainer does not support Zero/NaN missing-value splits")
+        self.num_features = M = int(arrays["num_features"])
+        self.sigmoid = float(arrays["sigmoid"])
+        self.small_batch = small_batch
+        self.chunk_size = chunk_size
+
+        trees, self.expected_value = _leaf_paths(arrays)
+        trees = [(nodes, leaves) for nodes, leaves in trees if leaves]
+
+        # Pairs (leaf, path feature), grouped by tree, then leaf
+        leaves = [leaf for _, tree_leaves in trees for leaf in tree_leaves]
+        k = np.array([len(leaf[1]) for leaf in leaves], dtype=np.int64)
+        self._pair_feature = np.concatenate([leaf[1] for leaf in leaves]).astype(np.intp)
+        self._pair_leaf = np.repeat(np.arange(len(leaves)), k)
+        position = np.arange(len(self._pair_leaf)) - np.repeat(np.cumsum(k) - k, k)
+        self._lo = np.concatenate([leaf[3] for leaf in leaves])[:, None]
+        self._hi = np.concatenate([leaf[4] for leaf in leaves])[:, None]
+        # Pattern index scaled by k, so a pair's entry is table[offset + pattern * k]
+        self._bit = (k[self._pair_leaf] << position)[:, None]
+        self._leaf_start = np.cumsum(k) - k
+
+        # All leaf tables in one array, leaf by leaf
+        sizes = (2 ** k) * k
+        leaf_offset = np.cumsum(sizes) - sizes
+        self._table = np.empty(int(sizes.sum()))
+        values = np.array([leaf[0] for leaf in leaves])
+        for length in np.unique(k):
+            group = np.flatnonzero(k == length)
+            z = np.array([leaves[i][2] for i in group])
+            tables = _leaf_tables(values[group], z).reshape(len(group), -1)
+            self._table[leaf_offset[group, None] + np.arange(tables.shape[1])] = tables
+        self._offset = (leaf_offset[self._pair_leaf] + position)[:, None]
+        # Pair -> feature one-hot, to sum pair contributions per feature with one matmul
+        self._onehot = np.zeros((M, len(self._pair_leaf)))
+        self._onehot[self._pair_feature, np.arange(len(self._pair_leaf))] = 1.0
+
+        self._trees = []
+        pair_start = leaf_start = 0
+        for _, tree_leaves in trees:
+            n_leaves = len(tree_leaves)
+            pair_end = pair_start + int(k[leaf_start:leaf_start + n_leaves].sum())
+            pairs = slice(pair_start, pair_end)
+            local_leaf = self._pair_leaf[pairs] - leaf_start
+            weights = np.zeros((n_leaves, pair_end - pair_start), dtype=np.float32)
+            weights[local_leaf, np.arange(pair_end - pair_start)] = self._bit[pairs, 0]
+            self._trees.append((pairs, local_leaf, weights))
+            pair_start, leaf_start = pair_end, leaf_start + n_leaves
+
+        self._build_cells(arrays, [nodes for nodes, _ in trees])
+
+    def _build_cells(self, arrays, tree_nodes: list):
+        """Per feature: sorted distinct thresholds and, per tree, the cell code
+        increment for each threshold bin"""
+        feature, threshold = arrays["feature"], arrays["threshold"]
+        n_trees = len(tree_nodes)
+        tree_of = np.repeat(np.arange(n_trees), [len(nodes) for nodes in tree_nodes])
+        nodes = np.concatenate(tree_nodes).astype(np.intp) if n_trees else np.empty(0, dtype=np.intp)
+        node_feature, node_threshold = feature[nodes], threshold[nodes]
+
+        radix = np.ones(n_trees, dtype=np.int64)
+        self._thresholds, self._cell_steps = [], []
+        for f in range(self.num_features):
+            on_f = node_feature == f
+            thresholds = np.unique(node_threshold[on_f])
+            # step[t, b]: number of tree t's distinct thresholds among the first b, times its radix
+            marks = np.zeros((n_trees, len(thresholds) + 1), dtype=np.int64)
+            marks[tree_of[on_f], np.searchsorted(thresholds, node_threshold[on_f]) + 1] = 1
+            counts = np.cumsum(marks, axis=1)
+            self._thresholds.append(thresholds)
+            self._cell_steps.append(counts * radix[:, None])
+            if np.any(np.log2(radix) + np.log2(counts[:, -1] + 1) >= 62):
+                raise ValueError("Trees have too many distinct splits for 64-bit cell codes")
+            radix = radix * (counts[:, -1] + 1)
+
+    def shap_values(self, X: np.ndarray) -> np.ndarray:
+        """(n, num_features + 1) contributions; the last column is the expected raw score"""
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] != self.num_features:
+            raise ValueError(f"Expected a 2D array with {self.num_features} features, got shape {X.shape}")
+        out = np.empty((len(X), self.num_features + 1))
+        out[:, -1] = self.expected_value
+        for start in range(0, len(X), self.chunk_size):
+            chunk = X[start:start + self.chunk_size]
+            # Without Zero/NaN splits LightGBM treats NaN as 0.0
+            XT = np.ascontiguousarray(np.where(np.isnan(chunk), 0.0, chunk).T)
+            evaluate = self._by_pair if len(chunk) <= self.small_batch else self._by_cell
+            out[start:start + len(chunk), :-1] = evaluate(XT).T
+        return out
+
+    def _by_pair(self, XT: np.ndarray) -> np.ndarray:
+        """All (leaf, feature) pairs of all trees for every row"""
+        x = XT[self._pair_feature]
+        agree = (x > self._lo) & (x <= self._hi)
+        pattern = np.add.reduceat(agree * self._bit, self._leaf_start, axis=0)
+        return self._onehot @ self._table[self._offset + pattern[self._pair_leaf]]
+
+    def _by_cell(self, XT: np.ndarray) -> np.ndarray:
+        """Tree by tree, once per distinct cell"""
+        n = XT.shape[1]
+        codes = np.zeros((len(self._trees), n), dtype=np.int64)
+        for x, thresholds, steps in zip(XT, self._thresholds, self._cell_steps):
+            codes += np.take(steps, np.searchsorted(thresholds, x), axis=1)
+
+        rows = np.arange(n)
+        phi = np.zeros((self.num_features, n))
+        for (pairs, local_leaf, weights), tree_codes in zip(self._trees, codes):
+            cell, distinct = pd.factorize(tree_codes)
+            representative = np.empty(len(distinct), dtype=np.intp)
+            representative[cell] = rows
+            x = XT[:, representative][self._pair_feature[pairs]]
+            agree = ((x > self._lo[pairs]) & (x <= self._hi[pairs])).astype(np.float32)
+            pattern = (weights @ agree).astype(np.int64)
+            contributions = self._onehot[:, pairs] @ self._table[self._offset[pairs] + pattern[local_leaf]]
+            phi += contributions[:, cell]
+        return phi
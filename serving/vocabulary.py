@@ -0,0 +1,224 @@
+"""Persistent, append-only categorical vocabulary.
+
+Codes are assigned in order of first appearance and never change, so data
+can be encoded chunk by chunk (and run after run) without seeing every label
+up front, unlike LabelEncoder's sorted classes_. SortedVocabulary looks
+labels up in such sorted classes for serving.
+"""
+import json
+import os
+import numpy as np
+import pandas as pd
+
+
+class Vocabulary:
+    def __init__(self, labels: dict[str, list[str]] | None = None):
+        self.labels = {column: list(values) for column, values in (labels or {}).items()}
+        self._index = {}
+
+    @classmethod
+    def load(cls, path: str) -> "Vocabulary":
+        if not os.path.exists(path):
+            return cls()
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def save(self, path: str):
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.labels, f)
+        os.replace(tmp, path)
+
+    def index(self, column: str) -> pd.Index:
+        """pd.Index over the column's labels; position = code"""
+        index = self._index.get(column)
+        if index is None:
+            index = self._index[column] = pd.Index(self.labels.setdefault(column, []), dtype=object)
+        return index
+
+    def encode(self, column: str, values, grow: bool = True) -> np.ndarray:
+        """Codes for `values`; unseen labels are appended (grow=True) or map to -1"""
+        values = pd.Series(values, dtype=object).astype(str)
+        codes = self.index(column).get_indexer(values)
+        if grow and (codes < 0).any():
+            new = pd.unique(values[codes < 0])
+            self.labels[column].extend(new.tolist())
+            self._index.pop(column)
+            codes = self.index(column).get_indexer(values)
+        return codes
+
+    def __len__(self):
+        return sum(len(values) for values in self.labels.values())
+
+
+class ProductVocabulary:
+    """Product IDs such as "M14860": a type letter plus a fixed number of digits.
+
+    Each ID is packed into one integer key (letter code point * 10**digits +
+    number) and codes are looked up in a dense (letter, number) table, so a
+    whole column encodes with a few NumPy operations and no string hashing.
+    Unseen IDs are appended with the next free codes; existing codes never
+    change. Saved as a small .npz of int32 keys in code order.
+    """
+
+    def __init__(self, keys=None, digits: int = 5):
+        self.digits = digits
+        self._radix = 10 ** digits
+        self.keys = np.empty(0, dtype=np.int32)
+        # ASCII letter -> row of self._table, -1 for letters not seen yet
+        self._rows = np.full(128, -1, dtype=np.int32)
+        self._table = np.empty((0, self._radix), dtype=np.int32)
+        self._flat = np.full(1, -1, dtype=np.int32)
+        if keys is not None:
+            self._append(np.asarray(keys, dtype=np.int32))
+
+    @classmethod
+    def from_labels(cls, labels, digits: int = 5) -> "ProductVocabulary":
+        """Vocabulary whose codes follow the order of `labels` (e.g. LabelEncoder.classes_)"""
+        vocabulary = cls(digits=digits)
+        keys = vocabulary.parse(labels)
+        if (keys < 0).any():
+            raise ValueError(f"Not a product ID: {np.asarray(labels)[keys < 0][:5].tolist()}")
+        vocabulary._append(keys)
+        return vocabulary
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> "ProductVocabulary":
+        """Vocabulary over the arrays of arrays(), used as is, e.g. read-only
+        memory maps shared between processes (which cannot grow)"""
+        vocabulary = cls(digits=int(arrays["digits"][0]))
+        vocabulary.keys, vocabulary._rows, vocabulary._flat = arrays["keys"], arrays["rows"], arrays["flat"]
+        vocabulary._table = vocabulary._flat[:-1].reshape(-1, vocabulary._radix)
+        return vocabulary
+
+    def arrays(self) -> dict:
+        """Keys and lookup table as flat NumPy arrays, see from_arrays()"""
+        return {
+            "keys": self.keys,
+            "rows": self._rows,
+            "flat": self._flat,
+            "digits": np.array([self.digits], dtype=np.int32),
+        }
+
+    @classmethod
+    def load(cls, path: str) -> "ProductVocabulary":
+        with np.load(path) as npz:
+            return cls(npz["keys"], digits=int(npz["digits"]))
+
+    def save(self, path: str):
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez_compressed(tmp, keys=self.keys, digits=self.digits)
+        os.replace(tmp, path)
+
+    def parse(self, values) -> np.ndarray:
+        """Packed integer key per ID, or -1 where it isn't a letter followed by `digits` digits"""
+        # One spare character: anything longer is cut there but still leaves it non-empty
+        width = self.digits + 2
+        chars = np.asarray(values, dtype=f"U{width}")
+        if chars.size == 0:
+            return np.empty(0, dtype=np.int32)
+        # UTF-32 code points, one contiguous row per character position
+        points = np.ascontiguousarray(chars).view(np.uint32).reshape(len(chars), width).T.copy()
+
+        # Unsigned wrap-around turns each range check into a single comparison
+        valid = (points[0] - np.uint32(ord("A"))) < 26
+        valid &= points[width - 1] == 0
+        keys = points[0].astype(np.int32)
+        for j in range(1, self.digits + 1):
+            digit = points[j] - np.uint32(ord("0"))
+            valid &= digit < 10
+            keys = keys * 10 + digit.astype(np.int32)
+        keys[~valid] = -1
+        return keys
+
+    def _lookup(self, keys: np.ndarray) -> np.ndarray:
+        letters, numbers = np.divmod(keys, self._radix)
+        # Malformed keys (-1) read _rows[-1], i.e. DEL, which is never a letter;
+        # they and unseen letters point at the table's trailing -1 cell
+        rows = self._rows[letters]
+        return self._flat[np.where(rows >= 0, rows * self._radix + numbers, -1)]
+
+    def _append(self, keys: np.ndarray):
+        keys = pd.unique(keys[self._lookup(keys) < 0])
+        if not len(keys):
+            return
+        for letter in np.unique(keys // self._radix):
+            if self._rows[letter] < 0:
+                self._rows[letter] = len(self._table)
+                self._table = np.vstack([self._table, np.full((1, self._radix), -1, dtype=np.int32)])
+        self._table[self._rows[keys // self._radix], keys % self._radix] = np.arange(
+            len(self.keys), len(self.keys) + len(keys), dtype=np.int32
+        )
+        self.keys = np.concatenate([self.keys, keys.astype(np.int32)])
+        self._flat = np.append(self._table.ravel(), np.int32(-1))
+
+    def encode(self, values, grow: bool = False) -> np.ndarray:
+        """Codes for a column of IDs; unseen IDs are appended (grow=True) or map to -1.
+        Malformed IDs always map to -1."""
+        keys = self.parse(values)
+        if grow:
+            self._append(keys[keys >= 0])
+        return self._lookup(keys)
+
+    def get(self, label, default: int = -1) -> int:
+        """Code for a single ID without NumPy string parsing, or `default`"""
+        if not (isinstance(label, str) and len(label) == self.digits + 1 and "A" <= label[0] <= "Z"
+                and label[1:].isascii() and label[1:].isdigit()):
+            return default
+        # .item() reads plain Python ints, avoiding NumPy scalar overhead per request
+        row = self._rows.item(ord(label[0]))
+        code = self._flat.item(row * self._radix + int(label[1:])) if row >= 0 else -1
+        return code if code >= 0 else default
+
+    def decode(self, codes) -> np.ndarray:
+        keys = self.keys[np.asarray(codes)]
+        letters = (keys // self._radix).astype(np.uint32).view("U1")
+        numbers = np.char.zfill((keys % self._radix).astype(str), self.digits)
+        return np.char.add(letters, numbers)
+
+    def labels(self) -> np.ndarray:
+        """All IDs in code order"""
+        return self.decode(np.arange(len(self.keys)))
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class SortedVocabulary:
+    """Codes are positions in a sorted label array, such as LabelEncoder.classes_.
+
+    Lookups are binary searches on the array itself, so it can be a read-only
+    memory map shared between processes.
+    """
+
+    def __init__(self, classes: np.ndarray):
+        self.classes = classes
+
+    def encode(self, values) -> np.ndarray:
+        """Codes for a column of labels, -1 for unseen ones"""
+        if not (isinstance(values, np.ndarray) and values.dtype.kind == "U"):
+            # Python strings: a throwaway hash table over the (few) classes is
+            # cheaper than converting every value to fixed-width unicode
+            return pd.Index(self.classes.tolist(), dtype=object).get_indexer(values)
+        if not len(self.classes):
+            return np.full(len(values), -1, dtype=np.intp)
+        codes = np.searchsorted(self.classes, values)
+        codes[codes == len(self.classes)] = 0
+        return np.where(self.classes[codes] == values, codes, -1)
+
+    def get(self, label, default: int = -1) -> int:
+        """Code for a single label, or `default`"""
+        if not isinstance(label, str):
+            return default
+        # Scalar binary search; np.searchsorted costs microseconds per call
+        lo, hi = 0, len(self.classes)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.classes.item(mid) < label:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self.classes) and self.classes.item(lo) == label else default
+
+    def __len__(self):
+        return len(self.classes)
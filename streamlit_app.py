@@ -3,13 +3,19 @@ import pandas as pd
 import numpy as np
 import joblib
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from serving.features import FeaturePipeline
+from serving.vocabulary import ProductVocabulary
 
 # -----------------------------
 # 1. Paths to artifacts
 # -----------------------------
 ARTIFACTS_DIR = r"D:\projects\Machine_failure_ai4i2020_dataset\artifacts"
 MODEL_PATH = os.path.join(ARTIFACTS_DIR, "lightgbm_model.joblib")
-PRODUCT_ENCODER_PATH = os.path.join(ARTIFACTS_DIR, "product_id_encoder.joblib")
+PRODUCT_VOCABULARY_PATH = os.path.join(ARTIFACTS_DIR, "product_vocabulary.npz")
 TYPE_ENCODER_PATH = os.path.join(ARTIFACTS_DIR, "type_encoder.joblib")
 
 # -----------------------------
@@ -19,14 +25,21 @@ TYPE_ENCODER_PATH = os.path.join(ARTIFACTS_DIR, "type_encoder.joblib")
 def load_model_and_encoders():
     try:
         model = joblib.load(MODEL_PATH)
-        product_encoder = joblib.load(PRODUCT_ENCODER_PATH)
+        product_vocabulary = ProductVocabulary.load(PRODUCT_VOCABULARY_PATH)
         type_encoder = joblib.load(TYPE_ENCODER_PATH)
-        return model, product_encoder, type_encoder
+        # Same feature pipeline as training and the APIs (serving/features.py)
+        pipeline = FeaturePipeline(
+            {"Product_ID": product_vocabulary.encode, "Type": pd.Index(type_encoder.classes_).get_indexer},
+            features=model.feature_name_,
+        )
+        return model, pipeline
     except Exception as e:
         st.error(f"Error loading model or encoders: {e}")
         st.stop()
 
-model, product_encoder, type_encoder = load_model_and_encoders()
+model, pipeline = load_model_and_encoders()
+# Derived metrics shown next to the prediction
+metrics_pipeline = FeaturePipeline({}, features=["Temperature_delta", "Mechanical_power"])
 
 # -----------------------------
 # 3. Streamlit App Layout
@@ -66,53 +79,32 @@ if submitted:
     if not product_id_input:
         st.error("Please enter a Product ID.")
     else:
-        # Encode Product ID and Type
-        try:
-            product_encoded = product_encoder.transform([product_id_input])[0]
-        except ValueError:
+        record = {
+            "product_id": product_id_input,
+            "type": type_input,
+            "air_temperature": air_temp,
+            "process_temperature": process_temp,
+            "rotational_speed": rotational_speed,
+            "torque": torque,
+            "tool_wear": tool_wear,
+        }
+
+        # Encode Product ID and Type and build the model's features
+        X = pipeline.transform_one(record)
+        unseen = pipeline.unseen(X)
+        if "Product_ID" in unseen:
             st.error(f"Product ID '{product_id_input}' not found in training dataset.")
             st.stop()
-            
-        try:
-            type_encoded = type_encoder.transform([type_input])[0]
-        except ValueError:
+        if "Type" in unseen:
             st.error(f"Type '{type_input}' not recognized.")
             st.stop()
-        
-        # Feature engineering (must match training)
-        temp_diff = process_temp - air_temp
-        power = torque * rotational_speed / 9550
-        
-        # Create input DataFrame matching training columns
-        feature_columns = [
-            "Product_ID", "Type",
-            "Air temperature [K]", "Process temperature [K]",
-            "Rotational speed [rpm]", "Torque [Nm]", "Tool wear [min]",
-            "temp_difference", "power", "TWF", "HDF", "PWF", "OSF"
-        ]
-        
-        # Fill additional columns (TWF, HDF, PWF, OSF) as 0 since unknown
-        input_dict = {
-            "Product_ID": product_encoded,
-            "Type": type_encoded,
-            "Air temperature [K]": air_temp,
-            "Process temperature [K]": process_temp,
-            "Rotational speed [rpm]": rotational_speed,
-            "Torque [Nm]": torque,
-            "Tool wear [min]": tool_wear,
-            "temp_difference": temp_diff,
-            "power": power,
-            "TWF": 0,
-            "HDF": 0,
-            "PWF": 0,
-            "OSF": 0
-        }
-        
-        input_df = pd.DataFrame([input_dict], columns=feature_columns)
-        
-        # Predict
-        pred = model.predict(input_df)[0]
+
+        input_df = pd.DataFrame(X, columns=pipeline.features)
+
+        # Predict (one model pass, label from the threshold saved with the model)
         pred_prob = model.predict_proba(input_df)[0, 1]
+        pred = int(pred_prob > getattr(model, "decision_threshold_", 0.5))
+        temp_diff, power = metrics_pipeline.transform_one(record)[0]
         
         # Display
         if pred == 1:
@@ -1,7 +1,17 @@
 import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from functools import partial
+import threading
 import pandas as pd
 import numpy as np
 import joblib
+import psutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from threadpoolctl import threadpool_limits
 
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
@@ -11,103 +21,313 @@ from sklearn.ensemble import AdaBoostClassifier, GradientBoostingClassifier
 from xgboost import XGBClassifier
 from lightgbm import LGBMClassifier
 
-# -----------------------------
-# 1. Load balanced dataset
-# -----------------------------
-df = pd.read_csv(r"D:\projects\Machine_failure_ai4i2020_dataset\Dataset\ai4i2020_smote.csv")
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BASE_DIR)
+
+from serving.features import FEATURES, TARGET, FeaturePipeline
+from serving.registry import file_sha256
+from serving.vocabulary import ProductVocabulary
 
 # -----------------------------
-# 2. Encode categorical columns
+# 1. Paths & split settings
 # -----------------------------
-categorical_cols = ["Product_ID", "Type"]
+DATA_PATH = os.path.join(BASE_DIR, "Dataset", "ai4i2020_smote.csv")
+artifacts_dir = os.path.join(BASE_DIR, "artifacts")
+SPLIT_CACHE_DIR = os.path.join(artifacts_dir, "cache", "splits")
+# Persistent Product_ID codes shared with lightgbm_training.py and the APIs
+PRODUCT_VOCABULARY_PATH = os.path.join(artifacts_dir, "product_vocabulary.npz")
 
-for col in categorical_cols:
-    df[col] = LabelEncoder().fit_transform(df[col])
+TEST_SIZE = 0.2
+RANDOM_STATE = 42
 
-# -----------------------------
-# 3. Split features & target
-# -----------------------------
-X = df.drop("Machine_failure", axis=1)
-y = df["Machine_failure"]
 
 # -----------------------------
-# 4. Train-test split
+# 2. Load, encode & split, cached by dataset hash
 # -----------------------------
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y,
-    test_size=0.2,
-    stratify=y,
-    random_state=42
-)
+def prepare_split(data_path: str = DATA_PATH) -> str:
+    """Directory of memory-mappable X/y train/test .npy files for this CSV and split.
 
-# -----------------------------
-# 5. Initialize Models
-# -----------------------------
-models = {
-    "AdaBoost": AdaBoostClassifier(n_estimators=200, learning_rate=0.05, random_state=42),
-    "GradientBoosting": GradientBoostingClassifier(n_estimators=300, learning_rate=0.05, max_depth=3, random_state=42),
-    "XGBoost": XGBClassifier(
-        n_estimators=300,
-        learning_rate=0.05,
-        max_depth=4,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        eval_metric="logloss",
-        use_label_encoder=False,
-        random_state=42
-    ),
-    "LightGBM": LGBMClassifier(
-        n_estimators=300,
-        learning_rate=0.05,
-        max_depth=-1,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        random_state=42
+    The key covers the CSV contents, the Product_ID vocabulary, the feature
+    list and the split settings, so editing the dataset (or the vocabulary,
+    FEATURES / TEST_SIZE / RANDOM_STATE) builds a new split instead of
+    reusing a stale one.
+    """
+    features_key = hashlib.sha256(",".join(FEATURES).encode()).hexdigest()[:8]
+    has_vocabulary = os.path.exists(PRODUCT_VOCABULARY_PATH)
+    vocabulary_key = file_sha256(PRODUCT_VOCABULARY_PATH)[:8] if has_vocabulary else "none"
+    key = file_sha256(data_path)[:16] + f"-v{vocabulary_key}-f{features_key}-t{TEST_SIZE}-r{RANDOM_STATE}"
+    split_dir = os.path.join(SPLIT_CACHE_DIR, key)
+    if os.path.exists(os.path.join(split_dir, "columns.json")):
+        print(f"Using cached split {split_dir}")
+        return split_dir
+
+    df = pd.read_csv(data_path)
+    # Same features and Product_ID codes as the served model; unseen IDs only grow this copy
+    if has_vocabulary:
+        product_vocabulary = ProductVocabulary.load(PRODUCT_VOCABULARY_PATH)
+    else:
+        product_vocabulary = ProductVocabulary()
+    pipeline = FeaturePipeline({
+        "Product_ID": partial(product_vocabulary.encode, grow=True),
+        "Type": LabelEncoder().fit(df["Type"]).transform,
+    }, features=FEATURES)
+
+    X = pd.DataFrame(pipeline.transform(df), columns=pipeline.features, index=df.index)
+    y = df[TARGET]
+
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y,
+        test_size=TEST_SIZE,
+        stratify=y,
+        random_state=RANDOM_STATE
     )
-}
+
+    # Written under a temporary name and renamed, so a crashed run never leaves a partial split
+    tmp_dir = f"{split_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp_dir, exist_ok=True)
+    for name, values in [("X_train", X_train), ("X_test", X_test), ("y_train", y_train), ("y_test", y_test)]:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values.to_numpy(dtype=np.float64 if name[0] == "X" else np.int64))
+    with open(os.path.join(tmp_dir, "columns.json"), "w") as f:
+        json.dump(list(X.columns), f)
+    os.replace(tmp_dir, split_dir)
+    print(f"Cached split in {split_dir}")
+    return split_dir
+
+
+def load_split(split_dir: str):
+    """Memory-mapped split; worker processes share the pages instead of each re-reading the CSV"""
+    with open(os.path.join(split_dir, "columns.json")) as f:
+        columns = json.load(f)
+    arrays = {name: np.load(os.path.join(split_dir, f"{name}.npy"), mmap_mode="r")
+              for name in ("X_train", "X_test", "y_train", "y_test")}
+    X_train = pd.DataFrame(arrays["X_train"], columns=columns)
+    X_test = pd.DataFrame(arrays["X_test"], columns=columns)
+    return X_train, X_test, arrays["y_train"], arrays["y_test"]
+
 
 # -----------------------------
-# 6. Create artifacts folder
+# 3. Initialize Models
 # -----------------------------
-artifacts_dir = r"D:\projects\Machine_failure_ai4i2020_dataset\artifacts"
-os.makedirs(artifacts_dir, exist_ok=True)
+def build_models(n_threads: int) -> dict:
+    return {
+        "AdaBoost": AdaBoostClassifier(n_estimators=200, learning_rate=0.05, random_state=42),
+        "GradientBoosting": GradientBoostingClassifier(n_estimators=300, learning_rate=0.05, max_depth=3, random_state=42),
+        "XGBoost": XGBClassifier(
+            n_estimators=300,
+            learning_rate=0.05,
+            max_depth=4,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            eval_metric="logloss",
+            use_label_encoder=False,
+            random_state=42,
+            n_jobs=n_threads
+        ),
+        "LightGBM": LGBMClassifier(
+            n_estimators=300,
+            learning_rate=0.05,
+            max_depth=-1,
+            subsample=0.8,
+            colsample_bytree=0.8,
+            random_state=42,
+            n_jobs=n_threads
+        )
+    }
+
+
+class PeakMemory:
+    """Samples this process's RSS in a background thread; `peak_mb` is the
+    increase over the RSS at start"""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.process = psutil.Process()
+        self._stop = threading.Event()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self.start = self.peak = self.process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.process.memory_info().rss)
+        self.peak_mb = (self.peak - self.start) / 1024 ** 2
+
 
 # -----------------------------
-# 7. Train, Evaluate & Save Models
+# 4. Train, Evaluate & Save one model (runs in a worker process)
 # -----------------------------
-results = []
+def train_and_evaluate(name: str, split_dir: str, n_threads: int) -> dict:
+    start = time.perf_counter()
+    X_train, X_test, y_train, y_test = load_split(split_dir)
+    model = build_models(n_threads)[name]
 
-for name, model in models.items():
-    print(f"\nTraining {name}...")
-    model.fit(X_train, y_train)
+    # Caps OpenMP/BLAS pools too, so concurrent workers don't oversubscribe the cores
+    with threadpool_limits(limits=n_threads), PeakMemory() as memory:
+        model.fit(X_train, y_train)
 
-    y_pred = model.predict(X_test)
-    
-    # Predict probabilities if available
-    if hasattr(model, "predict_proba"):
-        y_prob = model.predict_proba(X_test)[:, 1]
-    else:
-        y_prob = y_pred
+        y_pred = model.predict(X_test)
+
+        # Predict probabilities if available
+        if hasattr(model, "predict_proba"):
+            y_prob = model.predict_proba(X_test)[:, 1]
+        else:
+            y_prob = y_pred
+    wall_seconds = time.perf_counter() - start
 
     # Save trained model
     model_path = os.path.join(artifacts_dir, f"{name}.joblib")
     joblib.dump(model, model_path)
-    print(f"{name} saved to {model_path}")
 
-    results.append({
+    return {
         "Model": name,
         "Accuracy": accuracy_score(y_test, y_pred),
         "Precision": precision_score(y_test, y_pred),
         "Recall": recall_score(y_test, y_pred),
         "F1 Score": f1_score(y_test, y_pred),
-        "ROC-AUC": roc_auc_score(y_test, y_prob)
-    })
+        "ROC-AUC": roc_auc_score(y_test, y_prob),
+        "Wall Time (s)": round(wall_seconds, 2),
+        "Peak Memory (MB)": round(memory.peak_mb, 1),
+    }
+
 
 # -----------------------------
-# 8. Comparison Table
+# 5. Inference benchmark of one saved model (fresh process per model)
 # -----------------------------
-results_df = pd.DataFrame(results).sort_values(by="F1 Score", ascending=False)
+BENCH_SINGLE_ROWS = 500
+BENCH_SECONDS = 1.0
+BENCH_BATCH_SIZES = [1, 100, 10_000]
+
+
+def benchmark_inference(name: str, split_dir: str) -> dict:
+    """Single-row latency percentiles, batch throughput, artifact size and RSS after load.
+
+    Runs single-threaded, one model at a time, so every candidate is measured
+    under the same conditions as a serving worker thread.
+    """
+    _, X_test, _, _ = load_split(split_dir)
+    model_path = os.path.join(artifacts_dir, f"{name}.joblib")
+
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+    model = joblib.load(model_path)
+    load_rss_mb = (process.memory_info().rss - rss_before) / 1024 ** 2
+    if "n_jobs" in model.get_params():
+        model.set_params(n_jobs=1)
+
+    with threadpool_limits(limits=1):
+        rows = [X_test.iloc[[i % len(X_test)]] for i in range(BENCH_SINGLE_ROWS)]
+        model.predict_proba(rows[0])  # warm-up
+        latencies = []
+        for row in rows:
+            start = time.perf_counter()
+            model.predict_proba(row)
+            latencies.append(time.perf_counter() - start)
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+
+        throughput = {}
+        for size in BENCH_BATCH_SIZES:
+            batch = X_test.iloc[np.arange(size) % len(X_test)]
+            # Repeat for at least BENCH_SECONDS so slow and fast models both get stable numbers
+            repeats, start = 0, time.perf_counter()
+            while repeats == 0 or time.perf_counter() - start < BENCH_SECONDS:
+                model.predict_proba(batch)
+                repeats += 1
+            throughput[size] = size * repeats / (time.perf_counter() - start)
+
+    return {
+        "Model": name,
+        "p50 (ms)": round(p50, 3),
+        "p95 (ms)": round(p95, 3),
+        "p99 (ms)": round(p99, 3),
+        **{f"rows/s @{size}": round(throughput[size]) for size in BENCH_BATCH_SIZES},
+        "Size (MB)": round(os.path.getsize(model_path) / 1024 ** 2, 2),
+        "Load RSS (MB)": round(load_rss_mb, 1),
+    }
+
+
+def select_model(results_df: pd.DataFrame, max_p99_ms=None, max_size_mb=None, max_memory_mb=None):
+    """Highest-F1 model within the latency/size budget, and the candidates that fit it"""
+    within = pd.Series(True, index=results_df.index)
+    if max_p99_ms is not None:
+        within &= results_df["p99 (ms)"] <= max_p99_ms
+    if max_size_mb is not None:
+        within &= results_df["Size (MB)"] <= max_size_mb
+    if max_memory_mb is not None:
+        within &= results_df["Load RSS (MB)"] <= max_memory_mb
+    candidates = results_df[within].sort_values(by="F1 Score", ascending=False)
+    return (candidates.iloc[0]["Model"] if len(candidates) else None), candidates
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and compare the candidate models in parallel")
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1),
+                        help="Models trained concurrently, one process each")
+    parser.add_argument("--max-p99-ms", type=float, help="Budget: single-row p99 latency")
+    parser.add_argument("--max-size-mb", type=float, help="Budget: serialized model size")
+    parser.add_argument("--max-memory-mb", type=float, help="Budget: resident memory after load")
+    args = parser.parse_args()
+
+    # -----------------------------
+    # 6. Train all models concurrently
+    # -----------------------------
+    os.makedirs(artifacts_dir, exist_ok=True)
+    split_dir = prepare_split()
+
+    workers = max(1, args.workers)
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+    names = list(build_models(n_threads))
+
+    results = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(train_and_evaluate, name, split_dir, n_threads): name for name in names}
+        for future in as_completed(futures):
+            result = future.result()
+            print(f"{result['Model']} trained in {result['Wall Time (s)']}s, saved to "
+                  f"{os.path.join(artifacts_dir, result['Model'] + '.joblib')}")
+            results.append(result)
+    total_seconds = time.perf_counter() - start
+
+    # -----------------------------
+    # 7. Benchmark inference, one model at a time so timings don't contend
+    # -----------------------------
+    benchmarks = []
+    with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+        for name in names:
+            benchmarks.append(pool.submit(benchmark_inference, name, split_dir).result())
+            print(f"{name} benchmarked")
+
+    # -----------------------------
+    # 8. Comparison Table
+    # -----------------------------
+    results_df = (pd.DataFrame(results).merge(pd.DataFrame(benchmarks), on="Model")
+                  .sort_values(by="F1 Score", ascending=False))
+
+    print("\n=========== MODEL COMPARISON ===========")
+    print(results_df.to_string(index=False))
+    print(f"\n{len(names)} models on {workers} workers x {n_threads} threads in {total_seconds:.1f}s")
+
+    budget = {"max_p99_ms": args.max_p99_ms, "max_size_mb": args.max_size_mb, "max_memory_mb": args.max_memory_mb}
+    if all(limit is None for limit in budget.values()):
+        print("\nBest Model:", results_df.iloc[0]["Model"])
+        return
+
+    best, candidates = select_model(results_df, **budget)
+    limits = ", ".join(f"{key[4:]} <= {limit}" for key, limit in budget.items() if limit is not None)
+    print(f"\nWithin budget ({limits}):", ", ".join(candidates["Model"]) or "none")
+    if best is None:
+        print("Best Model: none of the candidates fits the budget")
+    else:
+        print("Best Model:", best)
+
 
-print("\n=========== MODEL COMPARISON ===========")
-print(results_df)
-print("\nBest Model:", results_df.iloc[0]["Model"])
+if __name__ == "__main__":
+    main()